@@ -0,0 +1,1534 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the Kraken-Futures client and the website pipeline.
+
+Everything runs against local stand-ins, no credentials or network needed:
+
+    python bench.py session [-n 500]
+    python bench.py snapshot [-n 50] [--latency 0.02]
+    python bench.py accounts [-n 10] [--accounts 24] [--latency 0.02]
+    python bench.py decode [-n 20]
+    python bench.py cache [-n 200] [--workers 32] [--latency 0.02]
+    python bench.py sign [-n 100000]
+    python bench.py nonce [-n 250000] [--workers 4]
+    python bench.py ratelimit [-n 60] [--error-rate 0.1]
+    python bench.py batching [-n 200] [--workers 4] [--latency 0.02]
+    python bench.py feed [-n 20000]
+    python bench.py orderbook [-n 500000] [--replay book.jsonl]
+    python bench.py serve [-n 200] [--workers 16]
+    python bench.py stream [-n 5] [--latency 0.02]
+    python bench.py prompt [-n 20]
+    python bench.py schedule [-n 40]
+    python bench.py template [-n 200]
+    python bench.py pagecache [-n 200]
+    python bench.py cycle [-n 20] [--workers 8] [--latency 0.02] [--recording kraken.json]
+
+``cycle`` replays whole generate_website() runs against the stand-ins
+while clients load the site. ``--recording`` takes a published kraken.json
+(e.g. from .versions/) or a {endpoint path: response} map. Add
+``--output results.jsonl`` to any benchmark to append its numbers, with
+the git revision, for comparing runs over time.
+"""
+import argparse
+import asyncio
+import base64
+import functools
+import http.client
+import http.server
+import contextlib
+import hashlib
+import hmac
+import io
+import json
+import multiprocessing
+import os
+import random
+import resource
+import socketserver
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.parse
+import uuid
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from websockets.asyncio.server import ServerConnection, serve
+from websockets.exceptions import ConnectionClosed
+
+import kraken_json
+from kraken_accounts import MultiAccountCollector
+from kraken_cache import ResponseCache
+from kraken_futures import KrakenFuturesApi
+from kraken_batching import OrderBatcher
+from kraken_futures_async import AsyncKrakenFuturesApi
+from kraken_nonce import FileNonce, MonotonicNonce
+from kraken_orderbook import OrderBook, OrderBookManager
+from kraken_ratelimit import RequestScheduler
+from kraken_ws import KrakenFuturesFeed, sign_challenge
+from page_cache import PageCache
+from page_stream import GenerationProgress, HtmlStreamExtractor, stream_html
+from page_template import PageTemplate, template_context
+from prompt_payload import build_payload, estimate_tokens, summarize
+from publisher import ArtifactPublisher
+from refresh_scheduler import ChangeDetector, RefreshScheduler
+from site_server import make_server
+
+DUMMY_KEY = "bench-key"
+DUMMY_SECRET = base64.b64encode(b"bench-secret-bench-secret-bench!").decode()
+
+
+# ----------------------------------------------------------------------
+# local Kraken stand-in
+# ----------------------------------------------------------------------
+PUBLIC_ENDPOINTS = frozenset({
+    "/derivatives/api/v3/instruments",
+    "/derivatives/api/v3/tickers",
+    "/derivatives/api/v3/orderbook",
+    "/derivatives/api/v3/history",
+})
+
+
+SNAPSHOT_ENDPOINTS = {
+    "accounts": "/derivatives/api/v3/accounts",
+    "open_positions": "/derivatives/api/v3/openpositions",
+    "open_orders": "/derivatives/api/v3/openorders",
+    "fills": "/derivatives/api/v3/fills",
+}
+
+
+def recorded_responses(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """Stub responses serving ``snapshot`` (live: later changes to it are served too)."""
+    return {path: (lambda key=key: snapshot[key]) for key, path in SNAPSHOT_ENDPOINTS.items()
+            if key in snapshot}
+
+
+def load_recording(path: str) -> Dict[str, Any]:
+    """A published kraken.json, or a JSON object of endpoint path -> recorded response."""
+    with open(path, encoding="utf-8") as f:
+        recording = json.load(f)
+    if any(key in recording for key in SNAPSHOT_ENDPOINTS):
+        return recorded_responses(recording)
+    return recording
+
+
+def _reference_sign(secret: str, endpoint: str, nonce: str, post_data: str = "") -> str:
+    """The original, unoptimised ``_sign_request``; the fast path must match it."""
+    path = endpoint[12:] if endpoint.startswith("/derivatives") else endpoint
+    message = (post_data + nonce + path).encode()
+    sha256_hash = hashlib.sha256(message).digest()
+    secret_decoded = base64.b64decode(secret)
+    sig = hmac.new(secret_decoded, sha256_hash, hashlib.sha512).digest()
+    return base64.b64encode(sig).decode()
+
+
+def _stub_payload(path: str, body: bytes) -> Dict[str, Any]:
+    if path.endswith("/batchorder"):
+        form = urllib.parse.parse_qs(body.decode())
+        statuses = []
+        for i, instruction in enumerate(json.loads(form["json"][0])["batchOrder"]):
+            if instruction["order"] == "send":
+                order_id = f"stub-{instruction['order_tag']}-{i}"
+                statuses.append({"status": "placed", "order_tag": instruction["order_tag"],
+                                 "order_id": order_id})
+            else:
+                status = "edited" if instruction["order"] == "edit" else "cancelled"
+                statuses.append({"status": status, "order_id": instruction.get("order_id")})
+        return {"result": "success", "batchStatus": statuses}
+    if path.endswith("/sendorder"):
+        return {"result": "success", "sendStatus": {"status": "placed", "order_id": "stub"}}
+    return {"result": "success", "path": path}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoint
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def _authentic(self, path: str, query: str, request_body: bytes) -> bool:
+        """Check APIKey/Nonce/Authent exactly as Kraken would for ``_sign_request``."""
+        nonce = self.headers.get("Nonce") or ""
+        secret = self.server.credentials.get(self.headers.get("APIKey"))
+        if secret is None or not nonce:
+            return False
+        data = request_body.decode() if self.command == "POST" else query
+        expected = _reference_sign(secret, path, nonce, data)
+        return hmac.compare_digest(self.headers.get("Authent") or "", expected)
+
+    def _reply(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        request_body = self.rfile.read(length) if length else b""
+        path, _, query = self.path.partition("?")
+        self.server.requests += 1
+        latency = self.server.key_latency.get(self.headers.get("APIKey"), self.server.latency)
+        if latency:
+            time.sleep(latency)
+        status = 200
+        recorded = self.server.responses.get(path)
+        if self.server.verify and path not in PUBLIC_ENDPOINTS and not self._authentic(
+            path, query, request_body
+        ):
+            self.server.auth_failures += 1
+            status, payload = 401, {"result": "error", "error": "authenticationError"}
+        elif self.server.error_rate and random.random() < self.server.error_rate:
+            status = self.server.error_status
+            payload = {"result": "error", "error": "apiLimitExceeded"}
+        elif recorded is not None:
+            payload = recorded() if callable(recorded) else recorded
+        else:
+            payload = _stub_payload(self.path, request_body)
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 256  # many clients connecting at once must not wait for SYN retries
+
+
+class StubKrakenServer:
+    """
+    Threaded HTTP server on localhost answering every endpoint with JSON,
+    after ``latency`` seconds, failing a random ``error_rate`` share of calls
+    with ``error_status``. Private endpoints must carry a valid signature
+    for DUMMY_KEY/DUMMY_SECRET, or one of the api key -> secret pairs in
+    ``credentials`` (401 otherwise, unless ``verify`` is off); ``key_latency``
+    overrides ``latency`` per api key. ``responses`` maps endpoint paths to
+    recorded payloads (or callables returning one); other paths get a
+    generic success reply.
+    """
+
+    def __init__(
+        self,
+        handler: type = _StubHandler,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 429,
+        responses: Optional[Dict[str, Any]] = None,
+        verify: bool = True,
+        credentials: Optional[Dict[str, str]] = None,
+        key_latency: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self.httpd = _StubHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.responses = dict(responses or {})  # type: ignore[attr-defined]
+        self.httpd.verify = verify  # type: ignore[attr-defined]
+        self.httpd.credentials = dict(credentials or {DUMMY_KEY: DUMMY_SECRET})  # type: ignore
+        self.httpd.key_latency = dict(key_latency or {})  # type: ignore[attr-defined]
+        self.httpd.auth_failures = 0  # type: ignore[attr-defined]
+        self.httpd.latency = latency  # type: ignore[attr-defined]
+        self.httpd.error_rate = error_rate  # type: ignore[attr-defined]
+        self.httpd.error_status = error_status  # type: ignore[attr-defined]
+        self.httpd.requests = 0  # type: ignore[attr-defined]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "StubKrakenServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def make_api(url: str, cls: type = KrakenFuturesApi, **kwargs: Any) -> Any:
+    """A client for the stub; rate limiting is off unless a scheduler is given."""
+    kwargs.setdefault("scheduler", RequestScheduler({}))
+    return cls(DUMMY_KEY, DUMMY_SECRET, url, **kwargs)
+
+
+# ----------------------------------------------------------------------
+# local Kraken WebSocket stand-in
+# ----------------------------------------------------------------------
+class StubKrakenFeedServer:
+    """
+    Speaks the challenge/subscribe protocol of the futures WebSocket API,
+    rejects bad signatures, answers each subscription with a snapshot and
+    lets the caller ``push`` updates or ``drop`` every connection.
+    """
+
+    SNAPSHOTS = {
+        "open_positions": {"feed": "open_positions", "positions": [
+            {"instrument": "PF_XBTUSD", "balance": 1.0, "entry_price": 60_000, "pnl": 12.5,
+             "mark_price": 60_100},
+        ]},
+        "open_orders": {"feed": "open_orders_snapshot", "orders": []},
+        "fills": {"feed": "fills_snapshot", "fills": [
+            {"fill_id": "f0", "instrument": "PF_XBTUSD", "price": 60_000, "qty": 1,
+             "buy": True, "time": 1_792_152_000_000, "order_id": "o0", "fill_type": "maker"},
+        ]},
+        "balances": {"feed": "balances_snapshot",
+                     "holding": {"USD": 250.0},
+                     "flex_futures": {"balance_value": 1_000, "portfolio_value": 1_012.5,
+                                      "pnl": 12.5, "available_margin": 900,
+                                      "currencies": {"USD": {"quantity": 1_000, "value": 1_000}}}},
+    }
+
+    def __init__(self, api_secret: str = DUMMY_SECRET) -> None:
+        self.api_secret = api_secret
+        self.connections: List[ServerConnection] = []
+        self.loop = asyncio.new_event_loop()
+        self.server: Any = None
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"ws://{host}:{port}"
+
+    async def _handler(self, ws: ServerConnection) -> None:
+        self.connections.append(ws)
+        challenge = str(uuid.uuid4())
+        try:
+            async for raw in ws:
+                message = json.loads(raw)
+                if message.get("event") == "challenge":
+                    await ws.send(json.dumps({"event": "challenge", "message": challenge}))
+                elif message.get("event") == "subscribe":
+                    feed = message["feed"]
+                    if feed in ("ticker", "book"):
+                        for product_id in message["product_ids"]:
+                            await ws.send(json.dumps(self._public_snapshot(feed, product_id)))
+                        continue
+                    expected = sign_challenge(self.api_secret, challenge)
+                    if message.get("signed_challenge") != expected:
+                        await ws.send(json.dumps({"event": "error", "message": "Invalid sign"}))
+                        continue
+                    await ws.send(json.dumps({"event": "subscribed", "feed": feed}))
+                    await ws.send(json.dumps(self.SNAPSHOTS[feed]))
+        except ConnectionClosed:
+            pass
+        finally:
+            self.connections.remove(ws)
+
+    @staticmethod
+    def _public_snapshot(feed: str, product_id: str) -> Dict[str, Any]:
+        if feed == "ticker":
+            return {"feed": "ticker", "product_id": product_id, "bid": 1.0}
+        return {"feed": "book_snapshot", "product_id": product_id, "seq": 0,
+                "bids": [{"price": 99.5, "qty": 1.0}], "asks": [{"price": 100.5, "qty": 1.0}]}
+
+    def push(self, messages: List[Dict[str, Any]]) -> None:
+        async def send_all() -> None:
+            for ws in list(self.connections):
+                for message in messages:
+                    await ws.send(json.dumps(message))
+
+        asyncio.run_coroutine_threadsafe(send_all(), self.loop).result()
+
+    def drop(self) -> None:
+        async def close_all() -> None:
+            for ws in list(self.connections):
+                await ws.close()
+
+        asyncio.run_coroutine_threadsafe(close_all(), self.loop).result()
+
+    def __enter__(self) -> "StubKrakenFeedServer":
+        async def start() -> Any:
+            return await serve(self._handler, "127.0.0.1", 0)
+
+        self.thread.start()
+        self.server = asyncio.run_coroutine_threadsafe(start(), self.loop).result()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.server.close()
+        asyncio.run_coroutine_threadsafe(self.server.wait_closed(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+# ----------------------------------------------------------------------
+# local Gemini stand-in
+# ----------------------------------------------------------------------
+class FakeGeminiModel:
+    """
+    ``genai.GenerativeModel`` look-alike answering every prompt with ``text``,
+    ``chunk_size`` characters per chunk, ``chunk_delay`` seconds apart.
+    Without ``stream=True`` the whole text comes back after all the delays.
+    With ``prompt_rate`` (bytes/s), reading the prompt takes time too.
+    """
+
+    def __init__(
+        self, text: str, chunk_size: int = 1_000, chunk_delay: float = 0.02,
+        prompt_rate: Optional[float] = None,
+    ) -> None:
+        self.text = text
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.prompt_rate = prompt_rate
+        self.calls = 0
+
+    def _chunks(self, prompt: str) -> Any:
+        if self.prompt_rate:
+            time.sleep(len(prompt.encode()) / self.prompt_rate)
+        for i in range(0, len(self.text), self.chunk_size):
+            time.sleep(self.chunk_delay)
+            yield SimpleNamespace(text=self.text[i:i + self.chunk_size])
+
+    def generate_content(self, prompt: str, stream: bool = False) -> Any:
+        self.calls += 1
+        if stream:
+            return self._chunks(prompt)
+        return SimpleNamespace(text="".join(chunk.text for chunk in self._chunks(prompt)))
+
+
+def fake_snapshot(
+    positions: int = 10, orders: int = 20, fills: int = 50, seed: int = 7
+) -> Dict[str, Any]:
+    """A REST-shaped account snapshot, as fetch_kraken_data returns it."""
+    rng = random.Random(seed)
+    symbols = [f"PF_{name}USD" for name in ("XBT", "ETH", "SOL", "XRP", "ADA", "DOT", "LTC")]
+
+    def stamp(i: int) -> str:
+        return f"2026-10-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:{(i * 7) % 60:02d}.000Z"
+
+    return {
+        "accounts": {"result": "success", "accounts": {
+            "cash": {"type": "cashAccount", "balances": {"xbt": rng.random(), "usd": 0.0}},
+            "flex": {
+                "type": "multiCollateralMarginAccount", "portfolioValue": rng.uniform(1e4, 1e5),
+                "balanceValue": rng.uniform(1e4, 1e5), "availableMargin": rng.uniform(1e3, 1e4),
+                "initialMargin": rng.uniform(1e2, 1e3), "pnl": rng.uniform(-500, 500),
+                "currencies": {"USD": {"quantity": rng.uniform(1e3, 1e4), "value": 1.0}},
+            },
+        }, "serverTime": stamp(0)},
+        "open_positions": {"result": "success", "openPositions": [
+            {"side": rng.choice(["long", "short"]), "symbol": symbols[i % len(symbols)],
+             "price": rng.uniform(1, 60_000), "fillTime": stamp(i), "size": rng.uniform(0.1, 50),
+             "unrealizedFunding": rng.uniform(-1, 1)}
+            for i in range(positions)
+        ]},
+        "open_orders": {"result": "success", "openOrders": [
+            {"order_id": str(uuid.UUID(int=rng.getrandbits(128))),
+             "symbol": symbols[i % len(symbols)], "side": rng.choice(["buy", "sell"]),
+             "orderType": "lmt", "limitPrice": rng.uniform(1, 60_000),
+             "unfilledSize": rng.uniform(0.1, 10), "receivedTime": stamp(i), "status": "untouched",
+             "filledSize": 0, "reduceOnly": False, "lastUpdateTime": stamp(i)}
+            for i in range(orders)
+        ]},
+        "fills": {"result": "success", "fills": [
+            {"fill_id": str(uuid.UUID(int=rng.getrandbits(128))),
+             "symbol": symbols[i % len(symbols)], "side": rng.choice(["buy", "sell"]),
+             "order_id": str(uuid.UUID(int=rng.getrandbits(128))), "size": rng.uniform(0.1, 10),
+             "price": rng.uniform(1, 60_000), "fillTime": stamp(i), "fillType": "maker"}
+            for i in range(fills)
+        ]},
+        "timestamp": "2026-10-16T12:00:00",
+        "data_points": 4,
+    }
+
+
+def fake_page(rows: int = 1_000, seed: int = 13) -> str:
+    rng = random.Random(seed)
+    body = "".join(f"<tr><td>PF_{i}USD</td><td>{rng.random():.6f}</td></tr>\n" for i in range(rows))
+    return f"<!DOCTYPE html>\n<html><body><table>\n{body}</table></body></html>"
+
+
+# ----------------------------------------------------------------------
+# reporting helpers
+# ----------------------------------------------------------------------
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+RESULTS: List[Dict[str, Any]] = []  # everything report() printed, for --output
+
+
+def report(label: str, samples: List[float], extra: Optional[Dict[str, Any]] = None) -> None:
+    ms = [s * 1_000 for s in samples]
+    mean, p50, p99 = statistics.mean(ms), percentile(ms, 50), percentile(ms, 99)
+    line = f"{label:<28} n={len(ms):<6} mean={mean:7.3f}ms p50={p50:7.3f}ms p99={p99:7.3f}ms"
+    for key, value in (extra or {}).items():
+        line += f" {key}={value}"
+    print(line)
+    RESULTS.append({
+        "label": label, "n": len(ms), "mean_ms": mean, "p50_ms": p50,
+        "p90_ms": percentile(ms, 90), "p99_ms": p99, **(extra or {}),
+    })
+
+
+def save_results(path: str, args: argparse.Namespace) -> None:
+    """Append this run as one JSON line, so runs can be compared over time."""
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        revision = ""
+    entry = {
+        "benchmark": args.benchmark, "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": revision, "args": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": RESULTS,
+    }
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, default=str) + "\n")
+
+
+# ----------------------------------------------------------------------
+# benchmarks
+# ----------------------------------------------------------------------
+def _time_calls(api: KrakenFuturesApi, n: int) -> List[float]:
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        api.get_accounts()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_session(args: argparse.Namespace) -> None:
+    """Per-request latency with a fresh connection per call vs the pooled session."""
+    with StubKrakenServer() as server:
+        # the ``requests`` module itself is a valid transport: one connection per call
+        unpooled = make_api(server.url, session=requests)
+        report("unpooled (requests.request)", _time_calls(unpooled, args.n))
+
+        with make_api(server.url) as pooled:
+            pooled.get_accounts()  # warm the pool
+            report("pooled (requests.Session)", _time_calls(pooled, args.n))
+
+
+def _peak_bytes_per_call(call: Any, n: int = 1_000) -> float:
+    """Average transient heap high-water mark of one ``call()``, via tracemalloc."""
+    call()
+    tracemalloc.start()
+    total = 0
+    for _ in range(n):
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        call()
+        total += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return total / n
+
+
+def bench_sign(args: argparse.Namespace) -> None:
+    """Signatures per second and heap use per signed request, checked against the reference."""
+    api = make_api("http://127.0.0.1", session=requests)
+    rng = random.Random(7)
+    endpoints = [
+        "/derivatives/api/v3/sendorder",
+        "/derivatives/api/v3/fills",
+        "/api/history/v2/account-log",
+    ]
+    cases = []
+    for i in range(1_000):
+        params = {"symbol": "PF_XBTUSD", "size": rng.randint(1, 10_000), "tag": "ü" * (i % 3)}
+        data = urllib.parse.urlencode(params) if i % 4 else ""
+        cases.append((rng.choice(endpoints), api._create_nonce(), data))
+    for endpoint, nonce, data in cases:
+        expected = _reference_sign(DUMMY_SECRET, endpoint, nonce, data)
+        if api._sign_request(endpoint, nonce, data) != expected:
+            raise SystemExit(f"signature mismatch for {endpoint} {nonce} {data!r}")
+    print(f"signatures identical to reference on {len(cases)} cases")
+
+    endpoint, nonce, data = cases[1]
+    for label, sign in (
+        ("reference", lambda: _reference_sign(DUMMY_SECRET, endpoint, nonce, data)),
+        ("_sign_request", lambda: api._sign_request(endpoint, nonce, data)),
+    ):
+        start = time.perf_counter()
+        for _ in range(args.n):
+            sign()
+        rate = args.n / (time.perf_counter() - start)
+        peak = _peak_bytes_per_call(sign)
+        print(f"{label:<28} {rate:>10,.0f} sig/s  peak heap {peak:,.0f} B/sig")
+
+    params = {"orderType": "lmt", "symbol": "PF_XBTUSD", "side": "buy", "size": 1, "limitPrice": 1}
+
+    def prepare() -> Any:
+        return api._prepare_request("POST", "/derivatives/api/v3/sendorder", params)
+
+    start = time.perf_counter()
+    for _ in range(args.n):
+        prepare()
+    rate = args.n / (time.perf_counter() - start)
+    peak = _peak_bytes_per_call(prepare)
+    print(f"{'_prepare_request (POST)':<28} {rate:>10,.0f} req/s  peak heap {peak:,.0f} B/req")
+
+
+def bench_snapshot(args: argparse.Namespace) -> None:
+    """Four-endpoint snapshot: sequential sync calls vs AsyncKrakenFuturesApi.gather_snapshot."""
+    with StubKrakenServer(latency=args.latency) as server:
+        with make_api(server.url) as api:
+            samples = []
+            for _ in range(args.n):
+                start = time.perf_counter()
+                api.get_accounts()
+                api.get_open_positions()
+                api.get_open_orders()
+                api.get_fills({"limit": 50})
+                samples.append(time.perf_counter() - start)
+            report("sequential", samples)
+
+        async def run_async() -> List[float]:
+            async with make_api(server.url, AsyncKrakenFuturesApi) as api:
+                samples = []
+                for _ in range(args.n):
+                    start = time.perf_counter()
+                    await api.gather_snapshot({"limit": 50})
+                    samples.append(time.perf_counter() - start)
+                return samples
+
+        report("gather_snapshot", asyncio.run(run_async()))
+
+
+def fake_market_payloads(
+    tickers: int = 2_000, trades: int = 100_000, seed: int = 5
+) -> Dict[str, bytes]:
+    """Large /tickers and /history bodies, as the server would send them."""
+    rng = random.Random(seed)
+    stamp = "2026-10-16T12:00:00.000Z"
+    return {
+        "/derivatives/api/v3/tickers": json.dumps({"result": "success", "serverTime": stamp,
+                                                   "tickers": [{
+            "tag": "perpetual", "pair": f"X{i}:USD", "symbol": f"PF_X{i}USD",
+            "markPrice": rng.uniform(1, 6e4), "bid": rng.uniform(1, 6e4), "bidSize": rng.random(),
+            "ask": rng.uniform(1, 6e4), "askSize": rng.random(), "vol24h": rng.uniform(0, 1e6),
+            "volumeQuote": rng.uniform(0, 1e9), "openInterest": rng.uniform(0, 1e5),
+            "open24h": rng.uniform(1, 6e4), "high24h": rng.uniform(1, 6e4),
+            "low24h": rng.uniform(1, 6e4), "last": rng.uniform(1, 6e4), "lastTime": stamp,
+            "lastSize": rng.random(), "suspended": False, "fundingRate": rng.uniform(-1e-4, 1e-4),
+            "fundingRatePrediction": rng.uniform(-1e-4, 1e-4), "postOnly": False,
+        } for i in range(tickers)]}).encode(),
+        "/derivatives/api/v3/history": json.dumps({"result": "success", "serverTime": stamp,
+                                                   "history": [{
+            "time": stamp, "trade_id": i, "price": rng.uniform(1, 6e4), "size": rng.random(),
+            "side": rng.choice(["buy", "sell"]), "type": "fill",
+            "uid": str(uuid.UUID(int=rng.getrandbits(128))),
+        } for i in range(trades)]}).encode(),
+    }
+
+
+def bench_decode(args: argparse.Namespace) -> None:
+    """
+    Decode time and peak heap of large /tickers and /history bodies per JSON
+    backend, through the client (eager vs lazy), and the kraken.json writer.
+    """
+    payloads = fake_market_payloads()
+    for path, body in payloads.items():
+        name = path.rsplit("/", 1)[1]
+        decoders = {"rsp.json() (old)": lambda body=body: json.loads(body.decode())}
+        decoders.update({backend: functools.partial(loads, body)
+                         for backend, (loads, _) in kraken_json.BACKENDS.items()})
+        for label, decode in decoders.items():
+            samples = []
+            for _ in range(args.n):
+                start = time.perf_counter()
+                decode()
+                samples.append(time.perf_counter() - start)
+            peak = _peak_bytes_per_call(decode, n=3)
+            report(f"{name} {label}", samples, {
+                "body": f"{len(body) / 1e6:.1f}MB", "peak": f"{peak / 1e6:.1f}MB",
+            })
+
+    default = kraken_json.BACKEND
+    modes = [(backend, False) for backend in sorted(kraken_json.BACKENDS)] + [(default, True)]
+    with StubKrakenServer(responses=payloads) as server:
+        for backend, lazy in modes:
+            kraken_json.use(backend)
+            with make_api(server.url, lazy=lazy, cache=ResponseCache({})) as api:
+                samples = []
+                for _ in range(args.n):
+                    start = time.perf_counter()
+                    tickers = api.get_tickers()
+                    if lazy:
+                        len(tickers.raw)  # passed on as bytes, never decoded
+                    samples.append(time.perf_counter() - start)
+                peak = _peak_bytes_per_call(api.get_tickers, n=3)
+            mode = "lazy (raw bytes)" if lazy else backend
+            report(f"get_tickers {mode}", samples, {"peak": f"{peak / 1e6:.1f}MB"})
+    kraken_json.use(default)
+
+    snapshot = fake_snapshot(positions=200, orders=500, fills=2_000)
+    writers = {
+        # before: pretty-printed for the file, then serialized again for a log line
+        "kraken.json (old)": lambda: (json.dumps(snapshot, indent=2), len(json.dumps(snapshot))),
+        "kraken.json (once)": lambda: kraken_json.dumps(snapshot),
+    }
+    for label, write in writers.items():
+        samples = []
+        for _ in range(args.n):
+            start = time.perf_counter()
+            written = write()
+            samples.append(time.perf_counter() - start)
+        size = len(written[0].encode()) if isinstance(written, tuple) else len(written)
+        peak = _peak_bytes_per_call(write, n=3)
+        report(label, samples, {"bytes": size, "peak": f"{peak / 1e6:.1f}MB"})
+
+
+def bench_accounts(args: argparse.Namespace) -> None:
+    """
+    ``--accounts`` subaccounts, one of them 5x slower and one with a revoked
+    key: every account in turn vs MultiAccountCollector's shared pool, which
+    also gets an account with a malformed secret and one without a key.
+    """
+    names = [f"sub{i:02d}" for i in range(args.accounts)]
+    accounts = {
+        name: (f"bench-key-{name}", base64.b64encode(f"{name}-secret".encode() * 4).decode())
+        for name in names
+    }
+    slow_key, revoked_key = accounts[names[0]][0], accounts[names[-1]][0]
+    credentials = {key: secret for key, secret in accounts.values() if key != revoked_key}
+
+    def client(api_key: str, api_secret: str, url: str, **kwargs: Any) -> KrakenFuturesApi:
+        return KrakenFuturesApi(api_key, api_secret, url, scheduler=RequestScheduler({}), **kwargs)
+
+    with StubKrakenServer(
+        latency=args.latency, responses=recorded_responses(fake_snapshot()),
+        credentials=credentials, key_latency={slow_key: args.latency * 5},
+    ) as server:
+        clients = [client(key, secret, server.url) for key, secret in accounts.values()]
+        samples = []
+        for _ in range(args.n):
+            start = time.perf_counter()
+            for api in clients:
+                for call in (api.get_accounts, api.get_open_positions, api.get_open_orders,
+                             lambda api=api: api.get_fills({"limit": 50})):
+                    with contextlib.suppress(RuntimeError):
+                        call()
+            samples.append(time.perf_counter() - start)
+        for api in clients:
+            api.close()
+        report("one account at a time", samples)
+
+        broken = dict(accounts, malformed=("bench-key-malformed", "not*base64!"),
+                      unset=("", ""))
+        with MultiAccountCollector(broken, server.url, fills_params={"limit": 50},
+                                   client_factory=client) as collector:
+            samples = []
+            for _ in range(args.n):
+                start = time.perf_counter()
+                snapshot = collector.collect()
+                samples.append(time.perf_counter() - start)
+        failed = [name for name, status in snapshot["subaccounts"].items() if not status["ok"]]
+        assert failed == sorted(["malformed", "unset", names[-1]]), failed
+        assert "client" in snapshot["subaccounts"]["malformed"]["errors"]
+        report("MultiAccountCollector", samples, {
+            "accounts": len(accounts), "failed": failed,
+            "positions": len(snapshot["open_positions"]["openPositions"]),
+            "slowest account": f"{args.latency * 5 * 1e3:.0f} ms",
+        })
+
+
+def bench_cache(args: argparse.Namespace) -> None:
+    """
+    ``--workers`` threads polling get_tickers ``-n`` times each, without and
+    with ResponseCache (50 ms TTL, stale for 1 s more), plus a cold burst
+    where every thread asks at once. Checks first that a lazy and an eager
+    client sharing one cache each get their own form of the response.
+    """
+    tickers = fake_market_payloads(trades=0)["/derivatives/api/v3/tickers"]
+    policies = {"/derivatives/api/v3/tickers": (0.05, 1.0)}
+
+    def poll(api: KrakenFuturesApi, n: int, barrier: threading.Barrier) -> List[float]:
+        samples = []
+        barrier.wait()
+        for _ in range(n):
+            start = time.perf_counter()
+            api.get_tickers()
+            samples.append(time.perf_counter() - start)
+            time.sleep(0.002)
+        return samples
+
+    shared = ResponseCache(policies)
+    with StubKrakenServer(responses={"/derivatives/api/v3/tickers": tickers}) as server:
+        with make_api(server.url, cache=shared, lazy=True) as lazy, \
+                make_api(server.url, cache=shared) as eager:
+            for _ in range(2):
+                assert isinstance(lazy.get_tickers(), kraken_json.LazyJson)
+                assert type(eager.get_tickers()) is dict
+        assert server.httpd.requests == 2, server.httpd.requests
+        assert shared.metrics()["hits"] == 2, shared.metrics()
+    print("lazy and eager clients each cached in their own form")
+
+    cases = [("no cache", ResponseCache({}), args.n), ("ResponseCache", None, args.n),
+             ("cold burst, one call each", None, 1)]
+    for label, cache, n in cases:
+        cache = cache if cache is not None else ResponseCache(policies)
+        with StubKrakenServer(latency=args.latency, responses={
+            "/derivatives/api/v3/tickers": tickers,
+        }) as server, make_api(server.url, cache=cache, pool_maxsize=args.workers) as api:
+            barrier = threading.Barrier(args.workers)
+            with ThreadPoolExecutor(args.workers) as pool:
+                futures = [pool.submit(poll, api, n, barrier) for _ in range(args.workers)]
+                samples = [s for future in futures for s in future.result()]
+            stats = cache.metrics()
+            report(label, samples, {
+                "http_requests": server.httpd.requests, "hit_rate": stats["hit_rate"],
+                "coalesced": stats["coalesced"], "refreshes": stats["refreshes"],
+            })
+
+
+def _draw_nonces(generator: Any, n: int) -> array:
+    out = array("Q")
+    for _ in range(n):
+        out.append(int(generator()))
+    return out
+
+
+def _nonce_process(path: str, n: int, threads: int) -> List[bytes]:
+    generator = FileNonce(path)
+    results: List[bytes] = [b""] * threads
+
+    def work(slot: int) -> None:
+        results[slot] = _draw_nonces(generator, n).tobytes()
+
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    generator.close()
+    return results
+
+
+def _check_nonces(label: str, sequences: List[array], elapsed: float) -> None:
+    total = sum(len(seq) for seq in sequences)
+    for seq in sequences:
+        if any(b <= a for a, b in zip(seq, seq[1:])):
+            raise SystemExit(f"{label}: nonce went backwards within one worker")
+    distinct = len(set().union(*sequences))
+    if distinct != total:
+        raise SystemExit(f"{label}: {total - distinct} duplicate nonces")
+    print(f"{label:<28} {total:>10,} nonces unique+monotonic  {total / elapsed:>12,.0f} nonce/s")
+
+
+def bench_nonce(args: argparse.Namespace) -> None:
+    """Stress both nonce modes across threads and processes; fail on any collision."""
+    generator = MonotonicNonce()
+    results: List[array] = [array("Q")] * args.workers
+
+    def work(slot: int) -> None:
+        results[slot] = _draw_nonces(generator, args.n)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    _check_nonces(f"MonotonicNonce x{args.workers} thr", results, time.perf_counter() - start)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "nonce")
+        start = time.perf_counter()
+        with multiprocessing.Pool(args.workers) as pool:
+            per_process = pool.starmap(_nonce_process, [(path, args.n, 2)] * args.workers)
+        elapsed = time.perf_counter() - start
+        sequences = []
+        for chunks in per_process:
+            for chunk in chunks:
+                seq = array("Q")
+                seq.frombytes(chunk)
+                sequences.append(seq)
+        _check_nonces(f"FileNonce {args.workers}proc x2 thr", sequences, elapsed)
+
+
+def bench_ratelimit(args: argparse.Namespace) -> None:
+    """
+    Saturate a small budget with reads, then send cancels: the cancels must
+    overtake the queued reads, and injected 429s must be retried away.
+    """
+    # 40 cost units per second: 20 reads of cost 2, or 4 cancels of cost 10
+    scheduler = RequestScheduler({"derivatives": (40, 1)})
+    finished: List[str] = []
+    lock = threading.Lock()
+
+    with StubKrakenServer(error_rate=0.1 if args.error_rate is None else args.error_rate) as server:
+        api = make_api(server.url, scheduler=scheduler, backoff=0.05, max_retries=5)
+
+        def call(kind: str) -> None:
+            if kind == "cancel":
+                api.cancel_order({"order_id": "x"})
+            else:
+                api.get_open_orders()
+            with lock:
+                finished.append(kind)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=call, args=("read",)) for _ in range(args.n)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)  # let the reads drain the bucket and queue up
+        cancels = [threading.Thread(target=call, args=("cancel",)) for _ in range(5)]
+        for thread in cancels:
+            thread.start()
+        for thread in threads + cancels:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        api.close()
+
+    last_cancel = max(i for i, kind in enumerate(finished) if kind == "cancel")
+    reads_after = finished[last_cancel:].count("read")
+    print(f"{len(finished)} calls in {elapsed:.2f}s")
+    print(f"{reads_after} of {args.n} queued reads finished after the last cancel")
+    for key, value in scheduler.metrics().items():
+        print(f"  {key:<24} {value}")
+
+
+def _submit_orders(submit: Any, n: int, workers: int) -> float:
+    """Submit ``n`` orders from ``workers`` threads at once; return elapsed seconds."""
+    orders = [
+        {"orderType": "lmt", "symbol": f"PF_{i % 40}USD", "side": "buy", "size": 1, "limitPrice": 1}
+        for i in range(n)
+    ]
+
+    def work(chunk: List[Dict[str, Any]]) -> None:
+        for order in chunk:
+            submit(order)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=work, args=(orders[i::workers],)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def bench_batching(args: argparse.Namespace) -> None:
+    """
+    Rebalance-style burst: one send_order per order vs OrderBatcher ->
+    batchorder, where the whole burst is submitted before any status is
+    waited for (waiting per order would cap a batch at one per worker).
+    """
+    with StubKrakenServer(latency=args.latency) as server:
+        with make_api(server.url, pool_maxsize=args.workers) as api:
+            elapsed = _submit_orders(api.send_order, args.n, args.workers)
+            print(f"{'unbatched send_order':<24} {args.n / elapsed:>8,.0f} orders/s "
+                  f"round trips={server.httpd.requests}")
+
+            server.httpd.requests = 0
+            futures: List[Any] = []
+            with OrderBatcher(api, window=0.01, max_batch=20) as batcher:
+                start = time.perf_counter()
+                _submit_orders(
+                    lambda order: futures.append(batcher.send_order(order)), args.n, args.workers
+                )
+                for future in futures:
+                    future.result()
+                elapsed = time.perf_counter() - start
+            print(f"{'OrderBatcher':<24} {args.n / elapsed:>8,.0f} orders/s "
+                  f"round trips={server.httpd.requests}")
+
+
+def _wait_for(condition: Any, timeout: float = 30.0) -> float:
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > timeout:
+            raise SystemExit("timed out waiting for the feed")
+        time.sleep(0.001)
+    return time.perf_counter() - start
+
+
+def bench_feed(args: argparse.Namespace) -> None:
+    """Feed connect/auth time, update throughput, reconnect time and snapshot cost."""
+    with StubKrakenFeedServer() as server:
+        feed = KrakenFuturesFeed(DUMMY_KEY, DUMMY_SECRET, server.url, products=["PF_XBTUSD"],
+                                 reconnect_delay=0.05)
+        with feed:
+            print(f"{'connect+auth+snapshots':<28} {_wait_for(lambda: feed.ready) * 1_000:8.2f}ms")
+
+            updates = [
+                {"feed": "open_orders", "order": {"order_id": f"o{i % 200}", "qty": i},
+                 "is_cancel": i % 7 == 0}
+                for i in range(args.n)
+            ]
+            target = feed.state.messages + args.n
+            start = time.perf_counter()
+            server.push(updates)
+            _wait_for(lambda: feed.state.messages >= target)
+            rate = args.n / (time.perf_counter() - start)
+            print(f"{'order updates applied':<28} {rate:>10,.0f} msg/s")
+
+            server.drop()
+            _wait_for(lambda: not feed.ready)
+            print(f"{'reconnect+resubscribe':<28} {_wait_for(lambda: feed.ready) * 1_000:8.2f}ms "
+                  f"(reconnects={feed.reconnects})")
+
+            samples = []
+            for _ in range(1_000):
+                start = time.perf_counter()
+                feed.snapshot()
+                samples.append(time.perf_counter() - start)
+            report("feed.snapshot()", samples)
+
+            # the snapshot must read like REST for the prompt and the change detector
+            before = feed.snapshot()
+            summary = summarize(before)
+            position = summary["positions"]["largest"][0]
+            assert (position["symbol"], position["side"], position["size"]) == ("PF_XBTUSD",
+                                                                               "long", 1.0)
+            assert summary["fills"]["by_symbol"][0]["symbol"] == "PF_XBTUSD"
+            assert summary["accounts"]["flex"]["portfolioValue"] == 1_012.5
+            resized = dict(StubKrakenFeedServer.SNAPSHOTS["open_positions"], positions=[
+                {"instrument": "PF_XBTUSD", "balance": 5.0, "entry_price": 60_000, "pnl": 12.5},
+            ])
+            target = feed.state.messages + 1
+            server.push([resized])
+            _wait_for(lambda: feed.state.messages >= target)
+            assert ChangeDetector().changes(before, feed.snapshot()), "resize not detected"
+
+            # malformed messages and failing handlers are skipped, the feed stays up
+            feed.handlers.append(lambda message: 1 / 0 if message.get("boom") else None)
+            target = feed.state.messages + 2
+            server.push([{"feed": "open_positions", "positions": [{"qty": 1}]},
+                         {"feed": "ticker", "product_id": "PF_XBTUSD", "boom": True}])
+            _wait_for(lambda: feed.skipped_messages >= 2)
+            assert feed._thread is not None and feed._thread.is_alive() and feed.ready
+            print(f"{'REST-shaped snapshot':<28} ok (bad messages skipped="
+                  f"{feed.skipped_messages}, thread alive)")
+
+
+def _synthetic_book_messages(n: int, levels: int = 500, seed: int = 3) -> List[Dict[str, Any]]:
+    """A book_snapshot followed by ``n`` seq'd deltas around a drifting mid."""
+    rng = random.Random(seed)
+    tick, mid = 0.5, 60_000.0
+    messages: List[Dict[str, Any]] = [{
+        "feed": "book_snapshot", "product_id": "PF_XBTUSD", "seq": 0,
+        "bids": [{"price": mid - tick * i, "qty": rng.uniform(0.1, 5)} for i in range(1, levels)],
+        "asks": [{"price": mid + tick * i, "qty": rng.uniform(0.1, 5)} for i in range(1, levels)],
+    }]
+    for seq in range(1, n + 1):
+        mid += rng.choice((-tick, 0.0, 0.0, tick))
+        side = rng.choice(("buy", "sell"))
+        offset = tick * rng.randint(1, levels)
+        price = mid - offset if side == "buy" else mid + offset
+        qty = 0.0 if rng.random() < 0.25 else rng.uniform(0.1, 5)
+        messages.append({"feed": "book", "product_id": "PF_XBTUSD", "seq": seq,
+                         "side": side, "price": price, "qty": qty})
+    return messages
+
+
+def bench_orderbook(args: argparse.Namespace) -> None:
+    """Replay book deltas: updates/s, query cost and memory per book."""
+    if args.replay:
+        with open(args.replay, encoding="utf-8") as f:
+            messages = [json.loads(line) for line in f if line.strip()]
+    else:
+        messages = _synthetic_book_messages(args.n)
+    snapshot, deltas = messages[0], messages[1:]
+    bids = [(lvl["price"], lvl["qty"]) for lvl in snapshot["bids"]]
+    asks = [(lvl["price"], lvl["qty"]) for lvl in snapshot["asks"]]
+
+    book = OrderBook(snapshot["product_id"])
+    book.load(bids, asks, snapshot.get("seq"))
+    start = time.perf_counter()
+    for m in deltas:
+        book.apply(m["side"], m["price"], m["qty"], m["seq"])
+    elapsed = time.perf_counter() - start
+    print(f"{'OrderBook.apply':<28} {len(deltas) / elapsed:>12,.0f} updates/s "
+          f"({len(book.bids.prices)} bids / {len(book.asks.prices)} asks)")
+
+    manager = OrderBookManager()
+    start = time.perf_counter()
+    for m in messages:
+        manager.handle(m)
+    elapsed = time.perf_counter() - start
+    print(f"{'OrderBookManager.handle':<28} {len(messages) / elapsed:>12,.0f} msg/s")
+
+    for label, query in (
+        ("best_bid/best_ask", lambda: (book.best_bid(), book.best_ask())),
+        ("depth_at", lambda: book.depth_at("buy", book.bids.prices[-1])),
+        ("vwap(buy, 25)", lambda: book.vwap("buy", 25)),
+    ):
+        start = time.perf_counter()
+        for _ in range(100_000):
+            query()
+        per_call = (time.perf_counter() - start) / 100_000
+        print(f"{label:<28} {per_call * 1e6:>12.3f} us/query")
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    fresh = OrderBook("mem")
+    fresh.load(book.bids.levels(), book.asks.levels())
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    levels = len(fresh.bids.prices) + len(fresh.asks.prices)
+    print(f"{'memory per book':<28} {used / 1024:>12,.1f} KiB ({used / levels:.0f} B/level)")
+
+    # a sequence gap resyncs off the feed loop: a slow, failing REST call must
+    # neither stall other messages nor kill the feed
+    attempts = []
+
+    def flaky_fetch(params: Dict[str, Any]) -> Dict[str, Any]:
+        attempts.append(time.perf_counter())
+        time.sleep(0.2)
+        if len(attempts) == 1:
+            raise RuntimeError("GET /derivatives/api/v3/orderbook failed : apiLimitExceeded")
+        return {"orderBook": {"bids": [[99.0, 2.0]], "asks": [[101.0, 2.0]]}}
+
+    manager = OrderBookManager(flaky_fetch, retry_delay=0.05)
+    with StubKrakenFeedServer() as server:
+        feed = KrakenFuturesFeed(url=server.url, products=["PF_XBTUSD"], public_feeds=["book"],
+                                 handlers=[manager.handle])
+        with feed:
+            _wait_for(lambda: "PF_XBTUSD" in manager.books
+                      and not manager.books["PF_XBTUSD"].stale)
+            target = feed.state.messages + 2
+            start = time.perf_counter()
+            server.push([
+                {"feed": "book", "product_id": "PF_XBTUSD", "side": "buy", "price": 99.0,
+                 "qty": 1.0, "seq": 5},
+                {"feed": "ticker", "product_id": "PF_XBTUSD", "bid": 99.0},
+            ])
+            _wait_for(lambda: feed.state.messages >= target)
+            behind = time.perf_counter() - start
+            _wait_for(lambda: not manager.books["PF_XBTUSD"].stale and not manager.resyncing())
+            recovered = time.perf_counter() - start
+            assert feed._thread is not None and feed._thread.is_alive()
+            assert feed.reconnects == 0 and manager.resync_errors == 1
+            assert manager.books["PF_XBTUSD"].best_bid() == (99.0, 2.0)
+        manager.close()
+    print(f"{'gap -> next message':<28} {behind * 1e3:>12.2f} ms (resync runs off the loop)")
+    print(f"{'gap -> book resynced':<28} {recovered * 1e3:>12.2f} ms "
+          f"(attempts={len(attempts)}, first failed, feed alive)")
+
+
+def _load_test(
+    port: int, clients: int, n: int, headers: Dict[str, str]
+) -> Tuple[float, List[float]]:
+    """``clients`` threads each GET ``n`` times over one connection: (elapsed, latencies)."""
+    latencies: List[List[float]] = [[] for _ in range(clients)]
+
+    def client(slot: int) -> None:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        for i in range(n):
+            start = time.perf_counter()
+            conn.request("GET", "/" if i % 4 else "/kraken.json", headers=headers)
+            rsp = conn.getresponse()
+            rsp.read()
+            latencies[slot].append(time.perf_counter() - start)
+        conn.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, [x for per_client in latencies for x in per_client]
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def bench_serve(args: argparse.Namespace) -> None:
+    """Concurrent clients against the old single-threaded server and site_server."""
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = "".join(
+            f"<tr><td>PF_{i}USD</td><td>{rng.random():.6f}</td></tr>\n" for i in range(1_500)
+        )
+        fills = [{"price": rng.random(), "qty": i} for i in range(500)]
+        ArtifactPublisher(tmp).publish({
+            "index.html": f"<!DOCTYPE html><html><body><table>{rows}</table></body></html>",
+            "kraken.json": json.dumps({"fills": fills}, indent=2),
+        })
+
+        legacy = socketserver.TCPServer(
+            ("127.0.0.1", 0), functools.partial(_QuietHandler, directory=tmp)
+        )
+        current = make_server(0, tmp, host="127.0.0.1")
+        current.RequestHandlerClass.func.log_message = _QuietHandler.log_message  # type: ignore
+        cases = [
+            ("TCPServer+SimpleHTTP", legacy, {}),
+            ("site_server identity", current, {}),
+            ("site_server gzip", current, {"Accept-Encoding": "gzip"}),
+        ]
+        for label, server, headers in cases:
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            elapsed, samples = _load_test(server.server_address[1], args.workers, args.n, headers)
+            report(label, samples, {"rps": f"{len(samples) / elapsed:,.0f}"})
+            server.shutdown()
+            thread.join()
+
+        # revalidation: every client already holds the current ETag
+        thread = threading.Thread(target=current.serve_forever, daemon=True)
+        thread.start()
+        conn = http.client.HTTPConnection("127.0.0.1", current.server_address[1])
+        conn.request("GET", "/", headers={"Accept-Encoding": "gzip"})
+        rsp = conn.getresponse()
+        rsp.read()
+        etag = rsp.getheader("ETag") or ""
+        conn.close()
+        elapsed, samples = _load_test(
+            current.server_address[1], args.workers, args.n,
+            {"Accept-Encoding": "gzip", "If-None-Match": etag},
+        )
+        report("site_server 304s", samples, {"rps": f"{len(samples) / elapsed:,.0f}"})
+        current.shutdown()
+        legacy.server_close()
+        current.server_close()
+
+
+def _listen_sse(port: int, marks: Dict[str, float]) -> None:
+    """Record when the first chunk and the done event reach an /events client."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    conn.request("GET", "/events")
+    rsp = conn.getresponse()
+    marks["connected"] = time.perf_counter()
+    for line in rsp:
+        if line.startswith(b"event: chunk") and "first" not in marks:
+            marks["first"] = time.perf_counter()
+        elif line.startswith(b"event: done"):
+            marks["done"] = time.perf_counter()
+            break
+    conn.close()
+
+
+def bench_stream(args: argparse.Namespace) -> None:
+    """Time to first content: blocking generate_content vs streamed chunks over SSE."""
+    page = fake_page()
+    model = FakeGeminiModel(f"Here you go:\n```html\n{page}\n```\nEnjoy!",
+                            chunk_delay=args.latency)
+
+    blocking = []
+    for _ in range(args.n):
+        start = time.perf_counter()
+        extractor = HtmlStreamExtractor()
+        extractor.feed(model.generate_content("prompt").text)
+        assert extractor.result() == page
+        blocking.append(time.perf_counter() - start)
+    report("blocking: first content", blocking)
+
+    progress = GenerationProgress()
+    with tempfile.TemporaryDirectory() as tmp:
+        server = make_server(0, tmp, host="127.0.0.1", progress=progress)
+        server.RequestHandlerClass.func.log_message = _QuietHandler.log_message  # type: ignore
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        first, total = [], []
+        for _ in range(args.n):
+            marks: Dict[str, float] = {}
+            client = threading.Thread(target=_listen_sse, args=(server.server_address[1], marks))
+            client.start()
+            while "connected" not in marks:
+                time.sleep(0.001)
+            start = time.perf_counter()
+            progress.begin()
+            chunks = (chunk.text for chunk in model.generate_content("prompt", stream=True))
+            assert stream_html(chunks, progress=progress) == page
+            progress.finish(True)
+            client.join()
+            first.append(marks["first"] - start)
+            total.append(marks["done"] - start)
+        report("streaming: first content", first)
+        report("streaming: complete", total)
+        server.shutdown()
+        server.server_close()
+
+
+def bench_prompt(args: argparse.Namespace) -> None:
+    """Prompt size and (modelled) generation latency, raw kraken.json vs build_payload."""
+    model = FakeGeminiModel(fake_page(200), chunk_delay=0.0, prompt_rate=2_000_000)
+    budget = 4_000  # tokens
+    for positions, orders, fills in ((5, 10, 50), (25, 50, 500), (100, 200, 5_000)):
+        snapshot = fake_snapshot(positions, orders, fills)
+        raw = json.dumps(snapshot, indent=2)
+        payload = build_payload(snapshot, max_tokens=budget)
+        assert build_payload(snapshot, max_tokens=budget) == payload  # deterministic
+        assert estimate_tokens(payload) <= budget
+        build = []
+        for _ in range(args.n):
+            start = time.perf_counter()
+            build_payload(snapshot, max_tokens=budget)
+            build.append(time.perf_counter() - start)
+        label = f"{positions}p/{orders}o/{fills}f"
+        for name, text in (("raw", raw), ("payload", payload)):
+            start = time.perf_counter()
+            model.generate_content(text)
+            latency = time.perf_counter() - start
+            print(f"{label:<16} {name:<8} bytes={len(text.encode()):>9,} "
+                  f"tokens~{estimate_tokens(text):>8,} generate={latency * 1_000:8.1f}ms")
+        report(f"{label} build_payload", build)
+
+
+def bench_schedule(args: argparse.Namespace) -> None:
+    """Account events -> page latency and Gemini calls, on a 1 s = 1 min time scale."""
+    rng = random.Random(5)
+    snapshot = fake_snapshot(positions=5, orders=5, fills=20)
+
+    # template-mode settings with a generator that always fails: retries must back off
+    attempts: List[float] = []
+
+    def failing(data: Optional[Dict[str, Any]]) -> bool:
+        attempts.append(time.perf_counter())
+        return False
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        failing_scheduler = RefreshScheduler(
+            lambda: snapshot, failing, refresh_interval=0.01, debounce=0, min_interval=0,
+            retry_delay=0.2,
+        ).start()
+        time.sleep(1.0)
+        failing_scheduler.stop()
+    gaps = [b - a for a, b in zip(attempts, attempts[1:])]
+    assert 2 <= len(attempts) <= 4 and all(gap >= 0.19 for gap in gaps), gaps
+    print(f"failing regenerate: {len(attempts)} attempts in 1 s, "
+          f"gaps {', '.join(f'{gap * 1e3:.0f}' for gap in gaps)} ms")
+    lock = threading.Lock()
+    pending: List[float] = []  # times of events not yet on a page
+    delays: List[float] = []
+
+    def fetch() -> Dict[str, Any]:
+        with lock:
+            return json.loads(json.dumps(snapshot))
+
+    def regenerate(data: Optional[Dict[str, Any]]) -> bool:
+        with lock:
+            seen = [t for t in pending if t <= data["generated_for"]] if data else []
+            del pending[:len(seen)]
+        time.sleep(0.2)  # Gemini
+        done = time.perf_counter()
+        delays.extend(done - t for t in seen)
+        return True
+
+    snapshot["generated_for"] = time.perf_counter()
+    scheduler = RefreshScheduler(
+        fetch, regenerate, refresh_interval=1 / 60, debounce=20 / 60,
+        min_interval=300 / 60, max_interval=3600 / 60,
+    ).start()
+    time.sleep(0.5)
+    start = time.perf_counter()
+    for i in range(args.n):
+        time.sleep(rng.expovariate(1 / 0.25))  # a fill every ~15 "minutes"
+        with lock:
+            fill = dict(snapshot["fills"]["fills"][0], fill_id=f"bench-{i}")
+            snapshot["fills"]["fills"].insert(0, fill)
+            snapshot["generated_for"] = time.perf_counter()
+            pending.append(snapshot["generated_for"])
+    while pending and time.perf_counter() - start < args.n * 2:
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    scheduler.stop()
+    stats = scheduler.stats()
+    # report() prints ms; at this scale 1 ms stands for 1 minute / 1000
+    report("event -> page (1s = 1min)", delays,
+           {"events": args.n, "generations": stats["generations"], "coalesced": stats["coalesced"]})
+    print(f"hourly loop over the same {elapsed:.0f} min: {elapsed / 60:.1f} generations, "
+          f"mean event -> page 30 min")
+
+
+FAKE_TEMPLATE = """<!DOCTYPE html><html><body>
+<h1>{{ accounts.flex.portfolioValue }}</h1><p>{{ generated_at }}</p>
+<table>{{#each positions.largest}}<tr><td>{{ symbol }}</td><td>{{ side }}</td>
+<td>{{ size }}</td><td>{{ price }}</td></tr>{{/each}}</table>
+<ul>{{#each fills.by_symbol}}<li>{{ symbol }} {{ fills }} fills, vwap {{ vwap }}</li>{{/each}}</ul>
+<script type="application/json" id="kraken-data">{{ kraken_json }}</script>
+</body></html>"""
+
+
+def bench_template(args: argparse.Namespace) -> None:
+    """Data refresh cost in template mode: local render vs a full (fake) generation."""
+    model = FakeGeminiModel(fake_page(), chunk_delay=args.latency)
+    start = time.perf_counter()
+    model.generate_content("prompt")
+    print(f"{'full generation (fake)':<28} {(time.perf_counter() - start) * 1_000:.1f}ms")
+    template = PageTemplate(FAKE_TEMPLATE)
+    for positions, orders, fills in ((5, 10, 50), (25, 50, 500), (100, 200, 5_000)):
+        snapshot = fake_snapshot(positions, orders, fills)
+        samples = []
+        for _ in range(args.n):
+            start = time.perf_counter()
+            context = template_context(summarize(snapshot), generated_at="now")
+            page = template.render(context)
+            samples.append(time.perf_counter() - start)
+        report(f"render {positions}p/{orders}o/{fills}f", samples, {"bytes": f"{len(page):,}"})
+
+
+def bench_pagecache(args: argparse.Namespace) -> None:
+    """Page cache lookups by snapshot size: key alone, key + hit, key + miss (put included)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = PageCache(tmp, max_entries=args.n * 2)
+        for positions, orders, fills in ((5, 10, 50), (25, 50, 500), (100, 200, 5_000)):
+            snapshot = fake_snapshot(positions, orders, fills)
+            page = fake_page()
+            cache.put(cache.key(snapshot, "prompt"), page)
+            cases = [
+                ("key", lambda: cache.key(snapshot, "prompt")),
+                ("key + hit", lambda: cache.get(cache.key(snapshot, "prompt"))),
+            ]
+            for label, lookup in cases:
+                samples = []
+                for _ in range(args.n):
+                    start = time.perf_counter()
+                    lookup()
+                    samples.append(time.perf_counter() - start)
+                report(f"{label} {positions}p/{orders}o/{fills}f", samples)
+            samples = []
+            for i in range(args.n):
+                snapshot["open_positions"]["openPositions"][0]["size"] = 1_000 + i
+                start = time.perf_counter()
+                key = cache.key(snapshot, "prompt")
+                if cache.get(key) is None:
+                    cache.put(key, page)
+                samples.append(time.perf_counter() - start)
+            report(f"key + miss {positions}p/{orders}o/{fills}f", samples, cache.stats())
+
+
+def _site_load(port: int, clients: int, stop: threading.Event) -> Tuple[float, List[float]]:
+    """Like _load_test, but until ``stop`` is set: (elapsed, latencies)."""
+    latencies: List[List[float]] = [[] for _ in range(clients)]
+
+    def client(slot: int) -> None:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        i = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            path = "/" if i % 4 else "/kraken.json"
+            conn.request("GET", path, headers={"Accept-Encoding": "gzip"})
+            rsp = conn.getresponse()
+            rsp.read()
+            latencies[slot].append(time.perf_counter() - start)
+            i += 1
+        conn.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, [x for per_client in latencies for x in per_client]
+
+
+def bench_cycle(args: argparse.Namespace) -> None:
+    """Whole generate_website() cycles against the Kraken and Gemini stand-ins, under load."""
+    import run  # needs google-generativeai importable; nothing is sent to it
+
+    snapshot = fake_snapshot(positions=25, orders=50, fills=50)
+    responses = load_recording(args.recording) if args.recording else recorded_responses(snapshot)
+    model = FakeGeminiModel(f"```html\n{fake_page()}\n```", chunk_delay=args.latency / 10)
+    error_rate = args.error_rate or 0.0
+    with tempfile.TemporaryDirectory() as tmp, StubKrakenServer(
+        latency=args.latency, error_rate=error_rate, responses=responses
+    ) as kraken:
+        # point the pipeline at the stand-ins and a scratch directory
+        os.environ.update(GOOGLE_API_KEY="bench", KRAKEN_API_KEY=DUMMY_KEY,
+                          KRAKEN_SECRET_KEY=DUMMY_SECRET)
+        run.KRAKEN_FUTURES_URL = kraken.url
+        run.create_gemini_model = lambda api_key: model
+        run.publisher = ArtifactPublisher(tmp)
+        run.page_cache = run.PageCache(os.path.join(tmp, ".page_cache"))
+        run.template_cache = run.PageCache(os.path.join(tmp, ".page_cache", "templates"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            run.create_loading_page()
+
+        site = make_server(0, tmp, host="127.0.0.1", publisher=run.publisher)
+        site.RequestHandlerClass.func.log_message = _QuietHandler.log_message  # type: ignore
+        threading.Thread(target=site.serve_forever, daemon=True).start()
+        stop = threading.Event()
+        load: List[Tuple[float, List[float]]] = []
+        loader = threading.Thread(
+            target=lambda: load.append(_site_load(site.server_address[1], args.workers, stop))
+        )
+        loader.start()
+
+        cycles, failed = [], 0
+        tracemalloc.start()
+        start = time.perf_counter()
+        for i in range(args.n):
+            if i % 4 != 3:  # every fourth cycle sees an unchanged account (page cache hit)
+                fill = dict(snapshot["fills"]["fills"][0], fill_id=f"cycle-{i}")
+                snapshot["fills"]["fills"].insert(0, fill)
+            began = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                ok = run.generate_website()
+            cycles.append(time.perf_counter() - began)
+            failed += not ok
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stop.set()
+        loader.join()
+        site.shutdown()
+        site.server_close()
+
+    report("generate_website cycle", cycles, {
+        "cycles/s": f"{len(cycles) / elapsed:.2f}", "failed": failed,
+        "cache": run.page_cache.stats()["hits"], "kraken_calls": kraken.httpd.requests,
+        "auth_failures": kraken.httpd.auth_failures,
+    })
+    load_elapsed, samples = load[0]
+    report("site under load", samples, {"rps": f"{len(samples) / load_elapsed:,.0f}"})
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{'memory':<28} traced peak={peak / 1e6:.1f} MB max rss={rss:.1f} MB")
+    RESULTS.append({"label": "memory", "traced_peak_mb": peak / 1e6, "max_rss_mb": rss})
+
+
+BENCHMARKS = {
+    "session": (bench_session, 500),
+    "snapshot": (bench_snapshot, 50),
+    "accounts": (bench_accounts, 10),
+    "decode": (bench_decode, 20),
+    "cache": (bench_cache, 200),
+    "sign": (bench_sign, 100_000),
+    "nonce": (bench_nonce, 250_000),
+    "ratelimit": (bench_ratelimit, 60),
+    "batching": (bench_batching, 200),
+    "feed": (bench_feed, 20_000),
+    "orderbook": (bench_orderbook, 500_000),
+    "serve": (bench_serve, 200),
+    "stream": (bench_stream, 5),
+    "prompt": (bench_prompt, 20),
+    "schedule": (bench_schedule, 40),
+    "template": (bench_template, 200),
+    "pagecache": (bench_pagecache, 200),
+    "cycle": (bench_cycle, 20),
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("-n", type=int, help="iterations per case (per worker)")
+    parser.add_argument(
+        "--error-rate", type=float, help="share of stub replies that are 429s (ratelimit: 0.1)"
+    )
+    parser.add_argument("--recording", help="kraken.json or endpoint->response JSON to serve")
+    parser.add_argument("--output", help="append the results to this JSON-lines file")
+    parser.add_argument("--replay", help="JSON-lines file of recorded book messages")
+    parser.add_argument("--workers", type=int, default=4, help="threads/processes to use")
+    parser.add_argument("--accounts", type=int, default=24, help="subaccounts (accounts)")
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="stub server delay per request (s)"
+    )
+    args = parser.parse_args()
+    run, default_n = BENCHMARKS[args.benchmark]
+    args.n = args.n or default_n
+    run(args)
+    if args.output:
+        save_results(args.output, args)
+
+
+if __name__ == "__main__":
+    main()
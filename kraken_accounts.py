@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+One snapshot across many Kraken-Futures (sub)accounts.
+
+    collector = MultiAccountCollector(load_accounts())
+    snapshot = collector.collect()
+
+Every account gets its own ``KrakenFuturesApi`` -- and with it its own
+nonce sequence and rate budget, both keyed on the API key -- and all
+``accounts × endpoints`` calls go through one shared thread pool, so the
+wall-clock time of a collection is about that of the slowest single call
+rather than the sum over accounts. The calls are network-bound, so
+threads are enough; the clients (and their pooled connections) are
+reused across collections.
+
+The merged snapshot keeps the REST shapes ``fetch_kraken_data`` already
+produces -- wallets as ``"<account>/<wallet>"``, every position, order and
+fill tagged with its ``account`` -- plus a ``subaccounts`` section with
+the per-account status. An account (or one endpoint of it) that fails is
+reported there -- including one whose client could not be built, e.g. for
+a missing or malformed secret; everything else is still returned.
+"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Any, List, Mapping, Optional, Tuple
+
+from kraken_futures import KrakenFuturesApi
+
+Credentials = Tuple[str, str]
+
+SECTIONS: Dict[str, Tuple[str, str]] = {
+    # snapshot key -> (client method, list key in the response)
+    "accounts": ("get_accounts", "accounts"),
+    "open_positions": ("get_open_positions", "openPositions"),
+    "open_orders": ("get_open_orders", "openOrders"),
+    "fills": ("get_fills", "fills"),
+}
+
+
+def load_accounts(env: Mapping[str, str] = os.environ) -> Dict[str, Credentials]:
+    """
+    Accounts from the environment: ``KRAKEN_ACCOUNTS_FILE`` (JSON object of
+    name -> {"api_key", "api_secret"}), or ``KRAKEN_ACCOUNTS=main,sub1`` with
+    ``KRAKEN_API_KEY_MAIN`` / ``KRAKEN_SECRET_KEY_MAIN`` etc. Empty when
+    neither is set (single-account setup). An account missing its key or
+    secret is still listed, with empty credentials, so the collector can
+    report it next to the others.
+    """
+    path = env.get("KRAKEN_ACCOUNTS_FILE")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+        return {
+            name: (entry.get("api_key") or "", entry.get("api_secret") or "")
+            for name, entry in raw.items()
+        }
+    accounts: Dict[str, Credentials] = {}
+    for name in filter(None, (n.strip() for n in env.get("KRAKEN_ACCOUNTS", "").split(","))):
+        suffix = name.upper().replace("-", "_")
+        accounts[name] = (
+            env.get(f"KRAKEN_API_KEY_{suffix}") or "",
+            env.get(f"KRAKEN_SECRET_KEY_{suffix}") or "",
+        )
+    return accounts
+
+
+def _tagged(records: List[Dict[str, Any]], account: str) -> List[Dict[str, Any]]:
+    return [dict(record, account=account) for record in records]
+
+
+class MultiAccountCollector:
+    def __init__(
+        self,
+        accounts: Mapping[str, Credentials],
+        base_url: str = "https://futures.kraken.com",
+        max_workers: int = 32,
+        fills_params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = 60.0,
+        client_factory: Callable[..., KrakenFuturesApi] = KrakenFuturesApi,
+    ) -> None:
+        """
+        ``timeout`` bounds a whole collection: calls still running after it
+        are reported as failed for their account (and finish in the
+        background). ``client_factory(api_key, api_secret, base_url,
+        pool_maxsize=...)`` builds the per-account clients; an account whose
+        client cannot be built is left out and reported in every snapshot.
+        """
+        if not accounts:
+            raise ValueError("MultiAccountCollector needs at least one account")
+        self.clients: Dict[str, KrakenFuturesApi] = {}
+        self.client_errors: Dict[str, str] = {}
+        for name, (key, secret) in accounts.items():
+            try:
+                if not key or not secret:
+                    raise ValueError("missing API key or secret")
+                self.clients[name] = client_factory(
+                    key, secret, base_url, pool_maxsize=len(SECTIONS)
+                )
+            except Exception as e:  # one bad account must not lose the others
+                self.client_errors[name] = f"{type(e).__name__}: {e}"
+        self.fills_params = fills_params if fills_params is not None else {}
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="kraken-account")
+
+    # ------------------------------------------------------------------
+    # collection
+    # ------------------------------------------------------------------
+    def _call(self, client: KrakenFuturesApi, method: str) -> Tuple[Dict[str, Any], float]:
+        start = time.perf_counter()
+        call = getattr(client, method)
+        result = call(self.fills_params) if method == "get_fills" else call()
+        return result, time.perf_counter() - start
+
+    def collect(self) -> Dict[str, Any]:
+        """Fetch every section of every account concurrently and merge them."""
+        futures = {
+            (name, section): self._executor.submit(self._call, client, method)
+            for name, client in self.clients.items()
+            for section, (method, _) in SECTIONS.items()
+        }
+        wait(futures.values(), timeout=self.timeout)
+
+        names = [*self.clients, *self.client_errors]
+        results: Dict[str, Dict[str, Any]] = {name: {} for name in names}
+        errors: Dict[str, Dict[str, str]] = {name: {} for name in names}
+        seconds: Dict[str, float] = {name: 0.0 for name in names}
+        for name, error in self.client_errors.items():
+            errors[name]["client"] = error
+        for (name, section), future in futures.items():
+            if not future.done():
+                future.cancel()
+                errors[name][section] = f"timed out after {self.timeout}s"
+                continue
+            try:
+                results[name][section], elapsed = future.result()
+                seconds[name] = max(seconds[name], elapsed)
+            except Exception as e:  # one account failing must not lose the others
+                errors[name][section] = str(e)
+        return self.merge(results, errors, seconds)
+
+    @staticmethod
+    def merge(
+        results: Dict[str, Dict[str, Any]],
+        errors: Dict[str, Dict[str, str]],
+        seconds: Dict[str, float],
+    ) -> Dict[str, Any]:
+        wallets: Dict[str, Any] = {}
+        merged: Dict[str, List[Dict[str, Any]]] = {
+            SECTIONS[section][1]: [] for section in ("open_positions", "open_orders", "fills")
+        }
+        subaccounts: Dict[str, Any] = {}
+        for name in sorted(results):
+            sections = results[name]
+            for wallet, data in (sections.get("accounts", {}).get("accounts") or {}).items():
+                wallets[f"{name}/{wallet}"] = data
+            for section in ("open_positions", "open_orders", "fills"):
+                key = SECTIONS[section][1]
+                merged[key].extend(_tagged(sections.get(section, {}).get(key) or [], name))
+            subaccounts[name] = {
+                "ok": not errors[name],
+                "errors": errors[name],
+                "fetch_seconds": round(seconds[name], 3),
+                "positions": len(sections.get("open_positions", {}).get("openPositions") or []),
+                "open_orders": len(sections.get("open_orders", {}).get("openOrders") or []),
+                "fills": len(sections.get("fills", {}).get("fills") or []),
+            }
+        merged["fills"].sort(key=lambda f: f.get("fillTime") or "", reverse=True)
+        return {
+            "accounts": {"accounts": wallets},
+            "open_positions": {"openPositions": merged["openPositions"]},
+            "open_orders": {"openOrders": merged["openOrders"]},
+            "fills": {"fills": merged["fills"]},
+            "subaccounts": subaccounts,
+        }
+
+    # ------------------------------------------------------------------
+    # lifecycle
+    # ------------------------------------------------------------------
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for client in self.clients.values():
+            client.close()
+
+    def __enter__(self) -> "MultiAccountCollector":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Coalesce individual order instructions into ``batchorder`` calls.
+
+    with OrderBatcher(api, window=0.05, max_batch=20) as batcher:
+        futures = [batcher.send_order(p) for p in orders]
+        statuses = [f.result() for f in futures]
+
+Instructions arriving within ``window`` seconds of the first one, up to
+``max_batch`` of them, go out as a single signed request. The methods take
+the parameters of their ``KrakenFuturesApi`` counterparts (an edit's
+``orderId`` becomes the batch instruction's ``order_id``). Each call returns
+a ``concurrent.futures.Future`` resolving to that instruction's entry of
+``batchStatus`` (or raising if the batch call itself failed).
+"""
+import json
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from typing import Deque, Dict, Any, List, Optional, Tuple
+
+from kraken_futures import KrakenFuturesApi
+
+_Item = Tuple[Dict[str, Any], "Future[Dict[str, Any]]"]
+_STOP = object()
+
+
+class OrderBatcher:
+    def __init__(self, api: KrakenFuturesApi, window: float = 0.05, max_batch: int = 20) -> None:
+        self.api = api
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._tags = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="kraken-batcher", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # instructions
+    # ------------------------------------------------------------------
+    def send_order(self, params: Dict[str, Any]) -> "Future[Dict[str, Any]]":
+        return self._submit("send", params)
+
+    def edit_order(self, params: Dict[str, Any]) -> "Future[Dict[str, Any]]":
+        # REST editorder names the order ``orderId``, a batch edit ``order_id``
+        if "orderId" in params:
+            params = dict(params)
+            order_id = params.pop("orderId")
+            if params.setdefault("order_id", order_id) != order_id:
+                raise ValueError(f"orderId {order_id!r} and order_id {params['order_id']!r} differ")
+        return self._submit("edit", params)
+
+    def cancel_order(self, params: Dict[str, Any]) -> "Future[Dict[str, Any]]":
+        return self._submit("cancel", params)
+
+    def _submit(self, kind: str, params: Dict[str, Any]) -> "Future[Dict[str, Any]]":
+        future: "Future[Dict[str, Any]]" = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("OrderBatcher is closed")
+            self._queue.put(({"order": kind, **params}, future))
+        return future
+
+    # ------------------------------------------------------------------
+    # worker
+    # ------------------------------------------------------------------
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch: List[_Item] = [first]
+            deadline = time.monotonic() + self.window
+            stop = False
+            while len(batch) < self.max_batch:
+                remaining = max(deadline - time.monotonic(), 0)
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch: List[_Item]) -> None:
+        # every send gets its own tag, so statuses cannot be confused even when
+        # callers repeat a tag or pass a non-string one; theirs is handed back
+        instructions = []
+        caller_tags: List[Any] = []
+        for instruction, _ in batch:
+            caller_tags.append(instruction.get("order_tag"))
+            if instruction["order"] == "send":
+                self._tags += 1
+                instruction = {**instruction, "order_tag": str(self._tags)}
+            instructions.append(instruction)
+
+        try:
+            rsp = self.api.batch_order({"json": json.dumps({"batchOrder": instructions})})
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        # sends come back by order_tag; edits/cancels by order_id or cliOrdId
+        by_tag: Dict[str, Dict[str, Any]] = {}
+        by_id: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        for entry in rsp.get("batchStatus", []):
+            if "order_tag" in entry:
+                by_tag[str(entry["order_tag"])] = entry
+            for key in ("order_id", "cliOrdId"):
+                if entry.get(key):
+                    by_id[entry[key]].append(entry)
+
+        for instruction, caller_tag, (_, future) in zip(instructions, caller_tags, batch):
+            status: Optional[Dict[str, Any]]
+            if instruction["order"] == "send":
+                status = by_tag.get(str(instruction["order_tag"]))
+                if status is not None and caller_tag is not None:
+                    status = {**status, "order_tag": caller_tag}
+            else:
+                ref = instruction.get("order_id") or instruction.get("cliOrdId")
+                status = by_id[ref].popleft() if by_id.get(ref) else None
+            if status is None:
+                error = RuntimeError(f"batchorder returned no status for {instruction}")
+                future.set_exception(error)
+            else:
+                future.set_result(status)
+
+    # ------------------------------------------------------------------
+    # lifecycle
+    # ------------------------------------------------------------------
+    def close(self) -> None:
+        """Flush anything still queued and stop the worker."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def __enter__(self) -> "OrderBatcher":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
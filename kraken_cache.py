@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Read-through cache for the public, slow-moving Kraken-Futures endpoints.
+
+``/instruments`` changes a few times a day and ``/tickers`` every few
+seconds, yet every caller used to pay a round trip for them.
+``ResponseCache`` keeps their responses per endpoint and parameters:
+
+* fresh for ``ttl`` seconds -- served from memory;
+* then stale for up to ``stale`` more seconds -- still served at once, while
+  one background call refreshes the entry (stale-while-revalidate);
+* older, or never fetched -- the caller fetches, and concurrent callers of
+  the same key wait for that one call instead of sending their own.
+
+The default policies keep prices fresh for trading clients: a ticker is
+at most 1 s old and never served stale, so a caller polling less often
+than that always gets a new response, while callers polling together
+share one. Instruments are fresh for 5 minutes and served stale for up to
+an hour while they refresh. Callers that can live with older prices pass
+their own ``policies``.
+
+At most ``max_entries`` keys are kept, least recently used out first.
+Like ``RequestScheduler``, one cache is shared by every client of one base
+URL; cached responses are shared too and must be treated as read-only.
+Clients that decode responses differently (``lazy``) pass a ``decoding``
+so each only ever gets responses in its own form.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from metrics import counter
+
+# endpoint -> (ttl, stale) in seconds; anything missing is never cached
+DEFAULT_POLICIES: Dict[str, Tuple[float, float]] = {
+    "/derivatives/api/v3/instruments": (300.0, 3600.0),
+    "/derivatives/api/v3/tickers": (1.0, 0.0),  # prices: no stale-while-revalidate
+}
+
+CACHE_LOOKUPS = counter(
+    "kraken_cache_lookups_total",
+    "Cached endpoint lookups by result: hit, stale, coalesced or miss.",
+    ("endpoint", "result"),
+)
+
+# lookup result (the metric label) -> counter in ResponseCache.metrics()
+RESULT_STATS = {"hit": "hits", "stale": "stale_hits", "coalesced": "coalesced", "miss": "misses"}
+
+CacheKey = Tuple[str, Hashable, Hashable]
+
+
+def _freeze(params: Optional[Dict[str, Any]]) -> Hashable:
+    return tuple(sorted((k, str(v)) for k, v in params.items())) if params else ()
+
+
+class _Entry:
+    __slots__ = ("value", "stored_at")
+
+    def __init__(self, value: Any, stored_at: float) -> None:
+        self.value = value
+        self.stored_at = stored_at
+
+
+class ResponseCache:
+    _registry: Dict[str, "ResponseCache"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, Tuple[float, float]]] = None,
+        max_entries: int = 256,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """``ResponseCache({})`` caches nothing, like ``RequestScheduler({})``."""
+        self.policies = DEFAULT_POLICIES if policies is None else policies
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._inflight: Dict[CacheKey, Future] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "hits": 0,
+            "stale_hits": 0,
+            "coalesced": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "evictions": 0,
+        }
+
+    @classmethod
+    def for_url(cls, base_url: str) -> "ResponseCache":
+        with cls._registry_lock:
+            cache = cls._registry.get(base_url)
+            if cache is None:
+                cache = cls._registry[base_url] = cls()
+            return cache
+
+    def caches(self, endpoint: str) -> bool:
+        return endpoint in self.policies
+
+    # ------------------------------------------------------------------
+    # lookups
+    # ------------------------------------------------------------------
+    def get(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, Any]],
+        load: Callable[[], Any],
+        decoding: Hashable = None,
+    ) -> Any:
+        """The cached response for ``(endpoint, params)``, calling ``load()`` when needed."""
+        ttl, stale = self.policies[endpoint]
+        key = (endpoint, decoding, _freeze(params))
+        with self._lock:
+            entry = self._entries.get(key)
+            age = self.clock() - entry.stored_at if entry is not None else None
+            if entry is not None and age <= ttl + stale:
+                self._entries.move_to_end(key)
+                if age <= ttl:
+                    result = "hit"
+                else:
+                    result = "stale"
+                    if key not in self._inflight:
+                        self._inflight[key] = future = Future()
+                        threading.Thread(
+                            target=self._refresh, args=(key, load, future),
+                            name="kraken-cache-refresh", daemon=True,
+                        ).start()
+                        self._stats["refreshes"] += 1
+                self._record(endpoint, result)
+                return entry.value
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            self._record(endpoint, "miss" if leader else "coalesced")
+
+        if not leader:
+            return future.result()
+        try:
+            value = load()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, value=value)
+        return value
+
+    def _refresh(self, key: CacheKey, load: Callable[[], Any], future: Future) -> None:
+        try:
+            value = load()
+        except Exception as e:  # keep serving the stale value; the next lookup retries
+            with self._lock:
+                self._stats["refresh_errors"] += 1
+            self._finish(key, future, error=e)
+        else:
+            self._finish(key, future, value=value)
+
+    def _finish(
+        self,
+        key: CacheKey,
+        future: Future,
+        value: Any = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        with self._lock:
+            del self._inflight[key]
+            if error is None:
+                self._entries[key] = _Entry(value, self.clock())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._stats["evictions"] += 1
+        if error is None:
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+
+    def _record(self, endpoint: str, result: str) -> None:
+        # called with the lock held
+        self._stats[RESULT_STATS[result]] += 1
+        CACHE_LOOKUPS.inc(endpoint=endpoint, result=result)
+
+    def invalidate(self, endpoint: Optional[str] = None) -> None:
+        """Drop every entry, or those of one endpoint."""
+        with self._lock:
+            for key in [k for k in self._entries if endpoint in (None, k[0])]:
+                del self._entries[key]
+
+    def metrics(self) -> Dict[str, Any]:
+        """Counters, entry count and the share of lookups served without waiting."""
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._stats)
+            snapshot["entries"] = len(self._entries)
+        lookups = sum(snapshot[k] for k in RESULT_STATS.values())
+        served = snapshot["hits"] + snapshot["stale_hits"]
+        snapshot["hit_rate"] = round(served / lookups, 4) if lookups else 0.0
+        return snapshot
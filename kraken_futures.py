@@ -6,11 +6,48 @@ Kraken-Futures API client.
 import base64
 import hashlib
 import hmac
+import random
 import time
 import urllib.parse
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Mapping, Optional, Tuple, Union
 
 import requests
+from requests.adapters import HTTPAdapter
+
+import kraken_json
+from kraken_cache import ResponseCache
+from kraken_json import LazyJson
+from kraken_nonce import MonotonicNonce
+from kraken_ratelimit import RequestScheduler
+from metrics import counter, histogram
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+REQUEST_SECONDS = histogram(
+    "kraken_request_seconds",
+    "Time per KrakenFuturesApi call, waiting for budget and retries included.",
+    ("method", "endpoint", "outcome"),
+)
+REQUEST_ATTEMPTS = counter(
+    "kraken_http_responses_total", "HTTP responses from Kraken by status.", ("endpoint", "status")
+)
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+def create_session(
+    pool_connections: int = 4,
+    pool_maxsize: int = 16,
+    keep_alive: bool = True,
+) -> requests.Session:
+    """Return a pooled requests.Session suitable for KrakenFuturesApi."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
 
 
 class KrakenFuturesApi:
@@ -19,67 +56,208 @@ class KrakenFuturesApi:
         api_key: str,
         api_secret: str,
         base_url: str = "https://futures.kraken.com",
+        session: Optional[Any] = None,
+        pool_connections: int = 4,
+        pool_maxsize: int = 16,
+        keep_alive: bool = True,
+        timeout: Optional[Timeout] = (5.0, 30.0),
+        nonce: Optional[Callable[[], str]] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        lazy: bool = False,
+        cache: Optional[ResponseCache] = None,
     ) -> None:
+        """
+        ``session`` is the transport: any object with a ``requests``-style
+        ``request(method, url, headers=..., data=..., timeout=...)`` method.
+        When omitted the client owns a pooled ``requests.Session`` and closes
+        it in ``close()``; a caller-supplied session is left open.
+        ``timeout`` is passed through as ``(connect, read)`` seconds.
+        ``nonce`` is a zero-argument callable returning the next nonce; it
+        defaults to the process-wide ``MonotonicNonce`` for ``api_key``. Pass
+        a ``kraken_nonce.FileNonce`` when several processes share the key.
+        ``scheduler`` enforces the per-key cost budgets and defaults to the
+        shared ``RequestScheduler`` for ``api_key``; ``RequestScheduler({})``
+        disables limiting. Rate-limited calls, and GETs answered with a 5xx,
+        are retried up to ``max_retries`` times with jittered exponential
+        backoff starting at ``backoff`` seconds. With ``lazy`` every call
+        returns a ``kraken_json.LazyJson``: the body is only decoded when a
+        key is read, and its ``raw`` bytes can be passed on untouched.
+        ``cache`` serves ``get_instruments``/``get_tickers`` from memory; it
+        defaults to the ``ResponseCache`` shared by all clients of
+        ``base_url``, whose tickers are never more than 1 s old (see
+        ``kraken_cache``), and ``ResponseCache({})`` turns caching off.
+        """
         self.api_key = api_key
-        self.api_secret = api_secret
+        self.api_secret = api_secret  # also prepares the signing key
         self.base_url = base_url.rstrip("/")
-        self._nonce_counter = 0
+        self.timeout = timeout
+        self.nonce = nonce if nonce is not None else MonotonicNonce.for_key(api_key)
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler.for_key(api_key)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.lazy = lazy
+        self.cache = cache if cache is not None else ResponseCache.for_url(self.base_url)
+        self._owns_session = session is None
+        self.session = session if session is not None else create_session(
+            pool_connections, pool_maxsize, keep_alive
+        )
+
+    @property
+    def api_key(self) -> str:
+        return self._api_key
+
+    @api_key.setter
+    def api_key(self, value: str) -> None:
+        self._api_key = value
+        self._base_headers = {
+            "APIKey": value,
+            "User-Agent": "Kraken-Futures-Py-Client/1.0",
+        }
+
+    @property
+    def api_secret(self) -> str:
+        return self._api_secret
+
+    @api_secret.setter
+    def api_secret(self, value: str) -> None:
+        # decode once; every signature copies this keyed HMAC state
+        self._api_secret = value
+        self._hmac = hmac.new(base64.b64decode(value), digestmod=hashlib.sha512)
+        self._sign_paths: Dict[str, bytes] = {}
+
+    # ------------------------------------------------------------------
+    # lifecycle
+    # ------------------------------------------------------------------
+    def close(self) -> None:
+        if self._owns_session and self.session is not None:
+            self.session.close()
+        self.session = None
+
+    def __enter__(self) -> "KrakenFuturesApi":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
 
     # ------------------------------------------------------------------
     # low-level helpers
     # ------------------------------------------------------------------
     def _create_nonce(self) -> str:
-        if self._nonce_counter > 9_999:
-            self._nonce_counter = 0
-        counter_str = f"{self._nonce_counter:05d}"
-        self._nonce_counter += 1
-        return f"{int(time.time() * 1_000)}{counter_str}"
+        return self.nonce()
 
     def _sign_request(self, endpoint: str, nonce: str, post_data: str = "") -> str:
-        # strip '/derivatives' prefix if present
-        path = endpoint[12:] if endpoint.startswith("/derivatives") else endpoint
-        message = (post_data + nonce + path).encode()
-        sha256_hash = hashlib.sha256(message).digest()
-        secret_decoded = base64.b64decode(self.api_secret)
-        sig = hmac.new(secret_decoded, sha256_hash, hashlib.sha512).digest()
-        return base64.b64encode(sig).decode()
+        path = self._sign_paths.get(endpoint)
+        if path is None:
+            # strip '/derivatives' prefix if present
+            stripped = endpoint[12:] if endpoint.startswith("/derivatives") else endpoint
+            path = self._sign_paths[endpoint] = stripped.encode()
+        # sha256(post_data + nonce + path), fed piecewise instead of concatenated
+        sha256 = hashlib.sha256()
+        if post_data:
+            sha256.update(post_data.encode())
+        sha256.update(nonce.encode())
+        sha256.update(path)
+        mac = self._hmac.copy()
+        mac.update(sha256.digest())
+        return base64.b64encode(mac.digest()).decode()
 
     # ------------------------------------------------------------------
     # single universal request method - FIXED VERSION
     # ------------------------------------------------------------------
-    def _request(
+    def _prepare_request(
         self, method: str, endpoint: str, params: Optional[Dict[str, Any]] = None
-    ) -> Dict[str, Any]:
-        params = params or {}
+    ) -> Tuple[str, Dict[str, str], str]:
+        """Return ``(url, headers, post_data)`` for a nonce'd, signed call."""
         url = self.base_url + endpoint
         nonce = self._create_nonce()
-        post_data = ""
-        headers = {
-            "APIKey": self.api_key,
-            "Nonce": nonce,
-            "User-Agent": "Kraken-Futures-Py-Client/1.0",
-        }
+        headers = self._base_headers.copy()
+        headers["Nonce"] = nonce
 
         # Build query string for both URL and signature
         query_string = urllib.parse.urlencode(params) if params else ""
-        
+
+        # FIX: Include query params in signature for GET requests
+        # For POST: the body, for GET: the URL query string
         if method.upper() == "POST":
             post_data = query_string
             headers["Content-Type"] = "application/x-www-form-urlencoded"
         else:
-            # For GET requests, include params in the URL
+            post_data = ""
             if query_string:
                 url += "?" + query_string
 
-        # FIX: Include query params in signature for GET requests
-        # For POST: use post_data, for GET: use query_string
-        signature_data = post_data if method.upper() == "POST" else query_string
-        headers["Authent"] = self._sign_request(endpoint, nonce, signature_data)
+        headers["Authent"] = self._sign_request(endpoint, nonce, query_string)
+        return url, headers, post_data
+
+    def _send(
+        self, method: str, url: str, headers: Dict[str, str], post_data: str
+    ) -> requests.Response:
+        if self.session is None:
+            raise RuntimeError("KrakenFuturesApi client is closed")
+        return self.session.request(
+            method, url, headers=headers, data=post_data or None, timeout=self.timeout
+        )
+
+    def _decode(self, body: bytes) -> Any:
+        return LazyJson(body) if self.lazy else kraken_json.loads(body)
+
+    def _retry_delay(self, attempt: int, rsp: requests.Response) -> float:
+        retry_after = rsp.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
 
-        rsp = requests.request(method, url, headers=headers, data=post_data or None)
-        if not rsp.ok:
-            raise RuntimeError(f"{method} {endpoint} failed : {rsp.text}")
-        return rsp.json()
+    def _request(
+        self, method: str, endpoint: str, params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        if method == "GET" and self.cache.caches(endpoint):
+            return self.cache.get(
+                endpoint, params, lambda: self._call(method, endpoint, params),
+                decoding="lazy" if self.lazy else None,
+            )
+        return self._call(method, endpoint, params)
+
+    def _call(
+        self, method: str, endpoint: str, params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            for attempt in range(self.max_retries + 1):
+                # wait for budget first, so the nonce is fresh when the call leaves
+                self.scheduler.acquire(endpoint, params)
+                url, headers, post_data = self._prepare_request(method, endpoint, params)
+                rsp = self._send(method, url, headers, post_data)
+                REQUEST_ATTEMPTS.inc(endpoint=endpoint, status=str(rsp.status_code))
+
+                result = self._decode(rsp.content) if rsp.ok else None
+                # the substring test keeps a lazy body undecoded on the normal path
+                rate_limited = rsp.status_code == 429 or (
+                    isinstance(result, Mapping)
+                    and b"apiLimitExceeded" in rsp.content
+                    and result.get("error") == "apiLimitExceeded"
+                )
+                # a 5xx on an order may still have been executed: only reads are replayed
+                retry = rate_limited or (
+                    rsp.status_code in RETRY_STATUSES and method.upper() == "GET"
+                )
+                if not retry or attempt == self.max_retries:
+                    break
+                if rate_limited:
+                    self.scheduler.penalize(endpoint)
+                self.scheduler.record_retry()
+                time.sleep(self._retry_delay(attempt, rsp))
+
+            if not rsp.ok:
+                raise RuntimeError(f"{method} {endpoint} failed : {rsp.text}")
+            outcome = "ok"
+            return result
+        finally:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start, method=method, endpoint=endpoint, outcome=outcome
+            )
 
     # ------------------------------------------------------------------
     # public endpoints
@@ -132,8 +310,8 @@ class KrakenFuturesApi:
     def get_fills(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         return self._request("GET", "/derivatives/api/v3/fills", params)
 
-    def get_account_log(self) -> Dict[str, Any]:
-        return self._request("GET", "/api/history/v2/account-log")
+    def get_account_log(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self._request("GET", "/api/history/v2/account-log", params)
 
     def get_transfers(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         return self._request("GET", "/derivatives/api/v3/transfers", params)
@@ -154,17 +332,16 @@ if __name__ == "__main__":
     KEY = os.getenv("KRAKEN_FUTURES_KEY", "YOUR_API_KEY")
     SEC = os.getenv("KRAKEN_FUTURES_SECRET", "YOUR_API_SECRET")
 
-    api = KrakenFuturesApi(KEY, SEC)
-
-    print("--- public tickers ---")
-    print(api.get_tickers()["tickers"][:2])
+    with KrakenFuturesApi(KEY, SEC) as api:
+        print("--- public tickers ---")
+        print(api.get_tickers()["tickers"][:2])
 
-    print("\n--- private accounts ---")
-    print(api.get_accounts())
+        print("\n--- private accounts ---")
+        print(api.get_accounts())
 
-    print("\n--- testing get_fills ---")
-    try:
-        fills = api.get_fills()
-        print("Fills:", fills)
-    except Exception as e:
-        print(f"Error getting fills: {e}")
+        print("\n--- testing get_fills ---")
+        try:
+            fills = api.get_fills()
+            print("Fills:", fills)
+        except Exception as e:
+            print(f"Error getting fills: {e}")
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Lazy, paginated history for the Kraken-Futures API client, plus an
+incremental SQLite store so later runs only fetch what is new.
+
+    for fill in iter_fills(api):            # newest first, one page at a time
+        ...
+
+    with HistoryStore("history.db") as store:
+        store.sync_fills(api)                # only fills newer than last run
+        store.sync_account_log(api)
+        for entry in store.records("account_log"):
+            ...
+
+Fills and public trades page backwards in time (``lastFillTime`` /
+``lastTime``); the account log pages forwards by entry id (``from`` +
+``sort=asc``). Records are stored as compact JSON keyed by their exchange
+id, so a page boundary landing inside one timestamp is harmless.
+"""
+import json
+import sqlite3
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple
+
+from kraken_futures import KrakenFuturesApi
+
+ACCOUNT_LOG_PAGE = 500
+
+
+def _iter_backwards(
+    fetch: Any,
+    records_key: str,
+    key_field: str,
+    time_field: str,
+    cursor_param: str,
+    params: Dict[str, Any],
+    since: Optional[str],
+) -> Iterator[Dict[str, Any]]:
+    """Walk a newest-first endpoint back in time until ``since`` (ISO timestamp)."""
+    cursor: Optional[str] = None
+    at_cursor: Set[Any] = set()  # keys already yielded with stamp == cursor
+    while True:
+        page_params = dict(params)
+        if cursor is not None:
+            page_params[cursor_param] = cursor
+        page = fetch(page_params).get(records_key) or []
+        oldest, at_oldest = cursor, set(at_cursor)
+        for record in page:
+            stamp, key = record.get(time_field), record.get(key_field)
+            if since is not None and stamp is not None and stamp < since:
+                return
+            if stamp == cursor and key in at_cursor:
+                continue  # the cursor may be inclusive
+            yield record
+            if stamp is not None and (oldest is None or stamp < oldest):
+                oldest, at_oldest = stamp, set()
+            if stamp == oldest:
+                at_oldest.add(key)
+        # an empty page, or one that did not move the cursor, is the end
+        if not page or oldest == cursor:
+            return
+        cursor, at_cursor = oldest, at_oldest
+
+
+def iter_fills(api: KrakenFuturesApi, since: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Every fill, newest first, back to ``since`` (inclusive)."""
+    return _iter_backwards(
+        api.get_fills, "fills", "fill_id", "fillTime", "lastFillTime", {}, since
+    )
+
+
+def iter_trade_history(
+    api: KrakenFuturesApi, symbol: str, since: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """Public trades of ``symbol``, newest first, back to ``since`` (inclusive)."""
+    return _iter_backwards(
+        api.get_history, "history", "uid", "time", "lastTime", {"symbol": symbol}, since
+    )
+
+
+def iter_account_log(
+    api: KrakenFuturesApi, after_id: Optional[int] = None, page_size: int = ACCOUNT_LOG_PAGE
+) -> Iterator[Dict[str, Any]]:
+    """Account-log entries with id > ``after_id``, oldest first."""
+    next_id = (after_id or 0) + 1
+    while True:
+        page = api.get_account_log({"from": next_id, "count": page_size, "sort": "asc"})
+        logs = page.get("accountLogs") or []
+        for entry in logs:
+            yield entry
+            next_id = max(next_id, int(entry["id"]) + 1)
+        if len(logs) < page_size:
+            return
+
+
+class HistoryStore:
+    """Append-only SQLite store of history records with a per-stream high-water mark."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                stream TEXT NOT NULL,
+                key TEXT NOT NULL,
+                ts TEXT,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (stream, key)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS records_by_time ON records (stream, ts);
+            CREATE TABLE IF NOT EXISTS watermarks (
+                stream TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        )
+
+    # ------------------------------------------------------------------
+    # low-level helpers
+    # ------------------------------------------------------------------
+    def watermark(self, stream: str) -> Optional[str]:
+        row = self.db.execute(
+            "SELECT value FROM watermarks WHERE stream = ?", (stream,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _append(
+        self, stream: str, records: Iterator[Dict[str, Any]], key_field: str, time_field: str,
+        batch: int = 500,
+    ) -> int:
+        """Insert records in batches; return how many were new."""
+        before = self.db.total_changes  # ignored duplicates do not count
+        rows = []
+        try:
+            for record in records:
+                rows.append((
+                    stream, str(record[key_field]), record.get(time_field),
+                    json.dumps(record, separators=(",", ":")),
+                ))
+                if len(rows) >= batch:
+                    self._insert(rows)
+                    rows = []
+        finally:
+            # keep what was already fetched even if a later page fails
+            if rows:
+                self._insert(rows)
+        return self.db.total_changes - before
+
+    def _insert(self, rows: List[Tuple[str, str, Optional[str], str]]) -> None:
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO records VALUES (?, ?, ?, ?)", rows)
+
+    def _set_watermark(self, stream: str, value: Optional[str]) -> None:
+        if value is None:
+            return
+        with self.db:
+            self.db.execute(
+                "INSERT INTO watermarks VALUES (?, ?) "
+                "ON CONFLICT(stream) DO UPDATE SET value = excluded.value",
+                (stream, value),
+            )
+
+    def _newest(self, stream: str) -> Optional[str]:
+        # served from the (stream, ts) index
+        row = self.db.execute("SELECT MAX(ts) FROM records WHERE stream = ?", (stream,)).fetchone()
+        return row[0]
+
+    # ------------------------------------------------------------------
+    # incremental sync
+    # ------------------------------------------------------------------
+    # Backwards-paged streams only move their watermark once the walk has
+    # reached the previous one, so an interrupted sync leaves no gap.
+    def sync_fills(self, api: KrakenFuturesApi) -> int:
+        records = iter_fills(api, self.watermark("fills"))
+        new = self._append("fills", records, "fill_id", "fillTime")
+        self._set_watermark("fills", self._newest("fills"))
+        return new
+
+    def sync_trade_history(self, api: KrakenFuturesApi, symbol: str) -> int:
+        stream = f"history:{symbol}"
+        records = iter_trade_history(api, symbol, self.watermark(stream))
+        new = self._append(stream, records, "uid", "time")
+        self._set_watermark(stream, self._newest(stream))
+        return new
+
+    def sync_account_log(self, api: KrakenFuturesApi) -> int:
+        after = self.watermark("account_log")
+        last_id = [int(after) if after else None]
+
+        def tracked() -> Iterator[Dict[str, Any]]:
+            for entry in iter_account_log(api, last_id[0]):
+                yield entry
+                last_id[0] = int(entry["id"])
+
+        try:
+            return self._append("account_log", tracked(), "id", "date")
+        finally:
+            # forward paging: whatever was stored is contiguous, keep it
+            self._set_watermark("account_log", None if last_id[0] is None else str(last_id[0]))
+
+    # ------------------------------------------------------------------
+    # reading back
+    # ------------------------------------------------------------------
+    def count(self, stream: str) -> int:
+        return self.db.execute(
+            "SELECT COUNT(*) FROM records WHERE stream = ?", (stream,)
+        ).fetchone()[0]
+
+    def records(
+        self, stream: str, since: Optional[str] = None, newest_first: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream stored records in time order without loading them all."""
+        query = (
+            "SELECT payload FROM records WHERE stream = ? AND (? IS NULL OR ts >= ?) "
+            f"ORDER BY ts {'DESC' if newest_first else 'ASC'}"
+        )
+        for (payload,) in self.db.execute(query, (stream, since, since)):
+            yield json.loads(payload)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> "HistoryStore":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
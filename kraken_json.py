@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+JSON backend shared by the Kraken modules: orjson when it is installed,
+the stdlib ``json`` module otherwise.
+
+    import kraken_json
+    data = kraken_json.loads(rsp.content)   # bytes or str
+    body = kraken_json.dumps(snapshot)      # compact UTF-8 bytes
+
+Call through the module (``kraken_json.loads``), not ``from kraken_json
+import loads``, so ``use()`` takes effect everywhere. ``KRAKEN_JSON=json``
+forces the stdlib backend at import time.
+
+``LazyJson`` wraps a response body and decodes it only when a key is first
+read; ``raw`` is always the body as received, for callers that pass it on.
+"""
+import json
+import os
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+Loads = Callable[[Union[bytes, str]], Any]
+Dumps = Callable[..., bytes]
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, LazyJson):
+        return value.data
+    return str(value)
+
+
+def _stdlib_dumps(value: Any, sort_keys: bool = False) -> bytes:
+    return json.dumps(
+        value, separators=(",", ":"), ensure_ascii=False, sort_keys=sort_keys, default=_default
+    ).encode("utf-8")
+
+
+def _orjson_dumps(value: Any, sort_keys: bool = False) -> bytes:
+    option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return orjson.dumps(value, default=_default, option=option)
+
+
+BACKENDS: Dict[str, Tuple[Loads, Dumps]] = {"json": (json.loads, _stdlib_dumps)}
+if orjson is not None:
+    BACKENDS["orjson"] = (orjson.loads, _orjson_dumps)
+
+BACKEND = ""
+loads: Loads = json.loads
+dumps: Dumps = _stdlib_dumps
+
+
+def use(name: Optional[str] = None) -> str:
+    """Switch backend (default: the fastest available); returns its name."""
+    global BACKEND, loads, dumps
+    name = name or ("orjson" if "orjson" in BACKENDS else "json")
+    if name not in BACKENDS:
+        raise ValueError(f"unknown or unavailable JSON backend {name!r}: {sorted(BACKENDS)}")
+    BACKEND = name
+    loads, dumps = BACKENDS[name]
+    return name
+
+
+use(os.getenv("KRAKEN_JSON") or None)
+
+
+# ----------------------------------------------------------------------
+# lazy responses
+# ----------------------------------------------------------------------
+class LazyJson(Mapping[str, Any]):
+    """A JSON object body, decoded on first access and then kept."""
+
+    __slots__ = ("raw", "_data")
+
+    def __init__(self, raw: bytes) -> None:
+        self.raw = raw
+        self._data: Optional[Dict[str, Any]] = None
+
+    @property
+    def decoded(self) -> bool:
+        return self._data is not None
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        if self._data is None:
+            self._data = loads(self.raw)
+        return self._data
+
+    def __getitem__(self, key: str) -> Any:
+        return self.data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __repr__(self) -> str:
+        if self._data is None:
+            return f"LazyJson(<{len(self.raw)} bytes, not decoded>)"
+        return f"LazyJson({self._data!r})"
+
+
+if __name__ == "__main__":
+    import time
+
+    body = dumps({"result": "success", "tickers": [
+        {"symbol": f"PF_{i}USD", "last": i * 1.5, "markPrice": i * 1.5001, "tag": "perpetual"}
+        for i in range(50_000)
+    ]})
+    for name in sorted(BACKENDS):
+        use(name)
+        start = time.perf_counter()
+        decoded = loads(body)
+        elapsed = time.perf_counter() - start
+        assert loads(dumps(decoded)) == decoded
+        print(f"{name:<8} decode {len(body):,} B in {elapsed * 1e3:.1f} ms")
+    lazy = LazyJson(body)
+    assert not lazy.decoded and lazy["tickers"][1]["last"] == 1.5 and lazy.decoded
+    assert loads(dumps({"snapshot": lazy})) == {"snapshot": lazy.data}
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Nonce generators for the Kraken-Futures API client.
+
+Kraken rejects a request whose nonce is not greater than the last one it
+saw for the API key, so every generator here hands out strictly increasing
+integers of the form ``<epoch ms><5 digit sequence>`` -- the same shape the
+original client produced, so values stay ahead of anything issued before.
+
+* ``MonotonicNonce`` -- in-process, thread-safe. ``MonotonicNonce.for_key``
+  returns one shared instance per API key, so several clients (e.g. the web
+  server and the update loop) cannot collide.
+* ``FileNonce`` -- cross-process. The last nonce lives in an 8-byte
+  memory-mapped file guarded by ``flock``, so any number of workers on one
+  host can share a key.
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict
+
+SEQUENCE_SPAN = 100_000  # five decimal digits per millisecond
+
+_COUNTER = struct.Struct("<Q")
+
+
+def _floor_nonce() -> int:
+    return int(time.time() * 1_000) * SEQUENCE_SPAN
+
+
+class MonotonicNonce:
+    """Strictly increasing nonces for every thread of this process."""
+
+    _registry: Dict[str, "MonotonicNonce"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._last = 0
+
+    @classmethod
+    def for_key(cls, api_key: str) -> "MonotonicNonce":
+        with cls._registry_lock:
+            generator = cls._registry.get(api_key)
+            if generator is None:
+                generator = cls._registry[api_key] = cls()
+            return generator
+
+    def __call__(self) -> str:
+        floor = _floor_nonce()
+        with self._lock:
+            # clock going backwards (NTP step) just keeps counting up
+            self._last = floor if floor > self._last else self._last + 1
+            return str(self._last)
+
+
+class FileNonce:
+    """Strictly increasing nonces shared by every process using ``path``."""
+
+    def __init__(self, path: str) -> None:
+        import fcntl  # POSIX only; imported here so the module loads anywhere
+
+        self._flock = fcntl.flock
+        self._lock_ex = fcntl.LOCK_EX
+        self._lock_un = fcntl.LOCK_UN
+        self.path = path
+        self._thread_lock = threading.Lock()  # flock is per open file, not per thread
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._flock(self._fd, self._lock_ex)
+        try:
+            if os.fstat(self._fd).st_size < _COUNTER.size:
+                os.ftruncate(self._fd, _COUNTER.size)
+        finally:
+            self._flock(self._fd, self._lock_un)
+        self._map = mmap.mmap(self._fd, _COUNTER.size)
+
+    def __call__(self) -> str:
+        floor = _floor_nonce()
+        with self._thread_lock:
+            self._flock(self._fd, self._lock_ex)
+            try:
+                (last,) = _COUNTER.unpack_from(self._map)
+                nonce = floor if floor > last else last + 1
+                _COUNTER.pack_into(self._map, 0, nonce)
+            finally:
+                self._flock(self._fd, self._lock_un)
+        return str(nonce)
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            self._map.close()
+            os.close(self._fd)
+            self._fd = -1
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Local L2 order books for Kraken-Futures instruments.
+
+Each side is a dict of price -> quantity plus a sorted list of its prices
+(kept with ``bisect``), so quantity changes at an existing level are O(1),
+new/removed levels cost a binary search plus one list memmove, and the best
+price is at one end of the list.
+
+``OrderBookManager`` seeds books from ``KrakenFuturesApi.get_orderbook`` and
+applies ``book_snapshot`` / ``book`` messages from the WebSocket feed. A gap
+in ``seq`` marks the book stale and triggers a resync from REST, on a worker
+thread so the feed's loop never blocks on it.
+"""
+import random
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+
+Level = Tuple[float, float]
+
+BUY = "buy"
+SELL = "sell"
+
+
+class _Side:
+    __slots__ = ("prices", "qty", "descending")
+
+    def __init__(self, descending: bool) -> None:
+        self.prices: List[float] = []  # ascending
+        self.qty: Dict[float, float] = {}
+        self.descending = descending  # bids: best price is the highest
+
+    def load(self, levels: Iterable[Level]) -> None:
+        self.qty = {float(p): float(q) for p, q in levels if float(q) > 0}
+        self.prices = sorted(self.qty)
+
+    def update(self, price: float, qty: float) -> None:
+        if qty > 0:
+            if price not in self.qty:
+                i = bisect_left(self.prices, price)
+                self.prices.insert(i, price)
+            self.qty[price] = qty
+        elif self.qty.pop(price, None) is not None:
+            i = bisect_left(self.prices, price)
+            del self.prices[i]
+
+    def best(self) -> Optional[Level]:
+        if not self.prices:
+            return None
+        price = self.prices[-1] if self.descending else self.prices[0]
+        return price, self.qty[price]
+
+    def levels(self, n: Optional[int] = None) -> List[Level]:
+        prices = self.prices[::-1] if self.descending else self.prices
+        return [(p, self.qty[p]) for p in prices[:n]]
+
+
+class OrderBook:
+    def __init__(self, symbol: str) -> None:
+        self.symbol = symbol
+        self.bids = _Side(descending=True)
+        self.asks = _Side(descending=False)
+        self.seq: Optional[int] = None
+        self.stale = True
+        self.updates = 0
+
+    def load(self, bids: Iterable[Level], asks: Iterable[Level], seq: Optional[int] = None) -> None:
+        """Replace the whole book; with ``seq=None`` the next delta sets the baseline."""
+        self.bids.load(bids)
+        self.asks.load(asks)
+        self.seq = seq
+        self.stale = False
+
+    def apply(self, side: str, price: float, qty: float, seq: Optional[int] = None) -> bool:
+        """Apply one level update; return False (and go stale) on a sequence gap."""
+        if seq is not None:
+            if self.seq is not None and seq <= self.seq:
+                return True  # already covered by the snapshot
+            if self.seq is not None and seq != self.seq + 1:
+                self.stale = True
+                return False
+            self.seq = seq
+        book_side = self.bids if side == BUY else self.asks
+        book_side.update(float(price), float(qty))
+        self.updates += 1
+        return True
+
+    # ------------------------------------------------------------------
+    # queries
+    # ------------------------------------------------------------------
+    def best_bid(self) -> Optional[Level]:
+        return self.bids.best()
+
+    def best_ask(self) -> Optional[Level]:
+        return self.asks.best()
+
+    def spread(self) -> Optional[float]:
+        bid, ask = self.bids.best(), self.asks.best()
+        return ask[0] - bid[0] if bid and ask else None
+
+    def mid(self) -> Optional[float]:
+        bid, ask = self.bids.best(), self.asks.best()
+        return (ask[0] + bid[0]) / 2 if bid and ask else None
+
+    def depth_at(self, side: str, price: float) -> float:
+        return (self.bids if side == BUY else self.asks).qty.get(float(price), 0.0)
+
+    def vwap(self, side: str, size: float) -> Optional[float]:
+        """
+        Average price to ``side`` ``size`` contracts against the book: a buy
+        walks the asks up, a sell walks the bids down. None if too thin, or
+        if ``size`` is not positive.
+        """
+        if size <= 0:
+            return None
+        book_side = self.asks if side == BUY else self.bids
+        prices = book_side.prices
+        order = range(len(prices)) if side == BUY else range(len(prices) - 1, -1, -1)
+        remaining, notional = size, 0.0
+        for i in order:
+            price = prices[i]
+            take = min(remaining, book_side.qty[price])
+            notional += take * price
+            remaining -= take
+            if remaining <= 0:
+                return notional / size
+        return None
+
+    def levels(self, n: Optional[int] = None) -> Dict[str, List[Level]]:
+        return {"bids": self.bids.levels(n), "asks": self.asks.levels(n)}
+
+
+class OrderBookManager:
+    """
+    Books for several symbols, fed from REST snapshots and WebSocket deltas.
+
+    ``fetch`` is any ``KrakenFuturesApi.get_orderbook``-like callable; pass
+    ``handle`` as a KrakenFuturesFeed message handler to keep books live.
+    """
+
+    def __init__(
+        self,
+        fetch: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+        retry_delay: float = 0.5,
+        max_retry_delay: float = 30.0,
+    ) -> None:
+        """
+        A failed resync is retried with jittered exponential backoff from
+        ``retry_delay`` up to ``max_retry_delay`` seconds until it succeeds
+        or the manager is closed; the book stays stale meanwhile.
+        """
+        self.fetch = fetch
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.books: Dict[str, OrderBook] = {}
+        self.resyncs = 0
+        self.resync_errors = 0
+        self.bad_messages = 0
+        self.last_error: Optional[str] = None
+        self._resyncing: set = set()
+        self._closed = threading.Event()
+        self._lock = threading.Lock()
+
+    def book(self, symbol: str) -> OrderBook:
+        with self._lock:
+            book = self.books.get(symbol)
+            if book is None:
+                book = self.books[symbol] = OrderBook(symbol)
+            return book
+
+    def seed(self, symbol: str) -> OrderBook:
+        """(Re)load ``symbol`` from the REST order book endpoint."""
+        if self.fetch is None:
+            raise RuntimeError("OrderBookManager has no REST fetch to seed from")
+        payload = self.fetch({"symbol": symbol})["orderBook"]
+        book = self.book(symbol)
+        with self._lock:
+            book.load(payload.get("bids", []), payload.get("asks", []))
+        return book
+
+    def handle(self, message: Dict[str, Any]) -> None:
+        """Feed handler: never blocks on REST and never raises."""
+        try:
+            self._handle(message)
+        except (KeyError, TypeError, ValueError) as e:
+            with self._lock:
+                self.bad_messages += 1
+                self.last_error = f"bad {message.get('feed')} message: {type(e).__name__}: {e}"
+
+    def _handle(self, message: Dict[str, Any]) -> None:
+        feed = message.get("feed")
+        if feed == "book_snapshot":
+            book = self.book(message["product_id"])
+            with self._lock:
+                book.load(
+                    ((lvl["price"], lvl["qty"]) for lvl in message.get("bids", [])),
+                    ((lvl["price"], lvl["qty"]) for lvl in message.get("asks", [])),
+                    message.get("seq"),
+                )
+        elif feed == "book":
+            symbol = message["product_id"]
+            book = self.book(symbol)
+            with self._lock:
+                if book.stale:
+                    return
+                ok = book.apply(
+                    message["side"], message["price"], message["qty"], message.get("seq")
+                )
+            if not ok and self.fetch is not None:
+                self._start_resync(symbol)
+
+    # ------------------------------------------------------------------
+    # resync
+    # ------------------------------------------------------------------
+    def _start_resync(self, symbol: str) -> None:
+        with self._lock:
+            if symbol in self._resyncing or self._closed.is_set():
+                return
+            self._resyncing.add(symbol)
+            self.resyncs += 1
+        threading.Thread(
+            target=self._resync, args=(symbol,), name=f"orderbook-resync-{symbol}", daemon=True
+        ).start()
+
+    def _resync(self, symbol: str) -> None:
+        delay = self.retry_delay
+        try:
+            while not self._closed.is_set():
+                try:
+                    self.seed(symbol)
+                    return
+                except Exception as e:  # e.g. a 429 or a network error: back off and retry
+                    with self._lock:
+                        self.resync_errors += 1
+                        self.last_error = f"resync {symbol}: {type(e).__name__}: {e}"
+                self._closed.wait(delay * random.uniform(0.5, 1.5))
+                delay = min(delay * 2, self.max_retry_delay)
+        finally:
+            with self._lock:
+                self._resyncing.discard(symbol)
+
+    def resyncing(self) -> List[str]:
+        with self._lock:
+            return sorted(self._resyncing)
+
+    def close(self) -> None:
+        """Stop retrying resyncs."""
+        self._closed.set()
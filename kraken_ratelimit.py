@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Client-side rate limiting for the Kraken-Futures API client.
+
+Kraken meters private calls per API key with two token budgets:
+
+* ``derivatives`` -- 500 cost units per 10 s for ``/derivatives/api/v3``
+* ``history``     -- 100 cost units per 10 min for ``/api/history/v2``
+
+``RequestScheduler`` mirrors those budgets locally with one token bucket
+each. Callers block in ``acquire()`` until their endpoint's cost fits, and
+while they wait they queue by priority: cancels first, then order entry,
+then reads. Public market-data endpoints are free and never wait.
+"""
+import heapq
+import itertools
+import json
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+# pool -> (capacity, refill period in seconds)
+DEFAULT_POOLS: Dict[str, Tuple[float, float]] = {
+    "derivatives": (500, 10),
+    "history": (100, 600),
+}
+
+# endpoint -> (pool, flat cost); anything missing is free
+ENDPOINT_COSTS: Dict[str, Tuple[str, int]] = {
+    "/derivatives/api/v3/accounts": ("derivatives", 2),
+    "/derivatives/api/v3/openpositions": ("derivatives", 2),
+    "/derivatives/api/v3/openorders": ("derivatives", 2),
+    "/derivatives/api/v3/recentorders": ("derivatives", 2),
+    "/derivatives/api/v3/fills": ("derivatives", 2),
+    "/derivatives/api/v3/orders": ("derivatives", 1),
+    "/derivatives/api/v3/notifications": ("derivatives", 2),
+    "/derivatives/api/v3/transfers": ("derivatives", 2),
+    "/derivatives/api/v3/sendorder": ("derivatives", 10),
+    "/derivatives/api/v3/editorder": ("derivatives", 10),
+    "/derivatives/api/v3/cancelorder": ("derivatives", 10),
+    "/derivatives/api/v3/cancelallorders": ("derivatives", 25),
+    "/derivatives/api/v3/cancelallordersafter": ("derivatives", 25),
+    "/derivatives/api/v3/batchorder": ("derivatives", 9),
+    "/api/history/v2/account-log": ("history", 3),
+}
+
+# account-log cost by requested ``count``: (upper bound, cost)
+ACCOUNT_LOG_COSTS = [(25, 1), (50, 2), (1_000, 3), (5_000, 6)]
+ACCOUNT_LOG_MAX_COST = 10
+
+PRIORITY_CANCEL = 0
+PRIORITY_ORDER = 1
+PRIORITY_READ = 2
+
+ENDPOINT_PRIORITIES: Dict[str, int] = {
+    "/derivatives/api/v3/cancelorder": PRIORITY_CANCEL,
+    "/derivatives/api/v3/cancelallorders": PRIORITY_CANCEL,
+    "/derivatives/api/v3/cancelallordersafter": PRIORITY_CANCEL,
+    "/derivatives/api/v3/sendorder": PRIORITY_ORDER,
+    "/derivatives/api/v3/editorder": PRIORITY_ORDER,
+    "/derivatives/api/v3/batchorder": PRIORITY_ORDER,
+}
+
+
+def endpoint_cost(endpoint: str, params: Optional[Dict[str, Any]] = None) -> Tuple[str, int]:
+    """Return ``(pool, cost)`` of one call, following Kraken's published table."""
+    pool, cost = ENDPOINT_COSTS.get(endpoint, ("", 0))
+    params = params or {}
+    if endpoint == "/derivatives/api/v3/fills" and "lastFillTime" in params:
+        cost = 25
+    elif endpoint == "/derivatives/api/v3/batchorder":
+        cost += _batch_size(params)
+    elif endpoint == "/api/history/v2/account-log":
+        count = int(params.get("count", 500))
+        cost = next((c for bound, c in ACCOUNT_LOG_COSTS if count <= bound), ACCOUNT_LOG_MAX_COST)
+    return pool, cost
+
+
+def _batch_size(params: Dict[str, Any]) -> int:
+    # instructions travel as {"json": '{"batchOrder": [...]}'}
+    payload = params.get("json")
+    try:
+        if isinstance(payload, str):
+            payload = json.loads(payload)
+        return max(1, len(payload["batchOrder"]))
+    except (KeyError, TypeError, ValueError):
+        return 1
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, period: float) -> None:
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self._stamp = time.monotonic()
+
+    def take(self, cost: float) -> float:
+        """Take ``cost`` tokens and return 0, or return seconds until they exist."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+        cost = min(cost, self.capacity)  # an oversized call must not wait forever
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def drain(self) -> None:
+        self.tokens = 0.0
+        self._stamp = time.monotonic()
+
+
+class RequestScheduler:
+    """Token buckets plus a priority wait queue, shared by every client of one key."""
+
+    _registry: Dict[str, "RequestScheduler"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, pools: Optional[Dict[str, Tuple[float, float]]] = None) -> None:
+        pools = DEFAULT_POOLS if pools is None else pools
+        self._buckets = {name: TokenBucket(*spec) for name, spec in pools.items()}
+        self._cond = threading.Condition()
+        self._waiting: Dict[str, List[Tuple[int, int]]] = {name: [] for name in pools}
+        self._tickets = itertools.count()
+        self._stats: Dict[str, float] = {
+            "requests": 0,
+            "queued": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "queue_depth_max": 0,
+        }
+
+    @classmethod
+    def for_key(cls, api_key: str) -> "RequestScheduler":
+        with cls._registry_lock:
+            scheduler = cls._registry.get(api_key)
+            if scheduler is None:
+                scheduler = cls._registry[api_key] = cls()
+            return scheduler
+
+    def acquire(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> float:
+        """Block until the call fits the budget; return the seconds spent waiting."""
+        pool, cost = endpoint_cost(endpoint, params)
+        bucket = self._buckets.get(pool)
+        start = time.monotonic()
+        with self._cond:
+            self._stats["requests"] += 1
+            if bucket is None or cost == 0:
+                return 0.0
+            queue = self._waiting[pool]
+            if not queue and bucket.take(cost) == 0:
+                return 0.0
+
+            ticket = (ENDPOINT_PRIORITIES.get(endpoint, PRIORITY_READ), next(self._tickets))
+            heapq.heappush(queue, ticket)
+            self._stats["queued"] += 1
+            self._stats["queue_depth_max"] = max(self._stats["queue_depth_max"], len(queue))
+            try:
+                while True:
+                    if queue[0] == ticket:
+                        delay = bucket.take(cost)
+                        if delay == 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+            finally:
+                if queue[0] == ticket:
+                    heapq.heappop(queue)
+                else:
+                    queue.remove(ticket)
+                    heapq.heapify(queue)
+                self._cond.notify_all()
+
+            waited = time.monotonic() - start
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+            return waited
+
+    def penalize(self, endpoint: str) -> None:
+        """The exchange said we are over budget: empty the bucket so everyone backs off."""
+        pool, _ = endpoint_cost(endpoint)
+        with self._cond:
+            self._stats["rate_limited"] += 1
+            bucket = self._buckets.get(pool)
+            if bucket is not None:
+                bucket.drain()
+
+    def record_retry(self) -> None:
+        with self._cond:
+            self._stats["retries"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Counters plus the current queue depth and token level of each pool."""
+        with self._cond:
+            snapshot: Dict[str, Any] = dict(self._stats)
+            for name, bucket in self._buckets.items():
+                snapshot[f"queue_depth.{name}"] = len(self._waiting[name])
+                snapshot[f"tokens.{name}"] = round(bucket.tokens, 2)
+            return snapshot
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Kraken-Futures WebSocket feed with an incrementally maintained account state.
+
+    feed = KrakenFuturesFeed(key, secret, products=["PF_XBTUSD"])
+    feed.start()
+    feed.wait_ready(timeout=10)
+    snapshot = feed.snapshot()  # no REST round trips
+
+The feed runs its own asyncio loop on a daemon thread. Private feeds are
+authenticated with Kraken's challenge/response scheme; after a dropped
+connection it reconnects with exponential backoff, signs a fresh challenge
+and resubscribes everything, and the snapshot messages that follow rebuild
+the state from scratch.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, Iterable, List, Optional
+
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import WebSocketException
+
+import kraken_json
+
+log = logging.getLogger(__name__)
+
+WS_URL = "wss://futures.kraken.com/ws/v1"
+
+PRIVATE_FEEDS = ("open_positions", "open_orders", "fills", "balances")
+
+# feed name of the full-state message each private subscription starts with
+SNAPSHOT_FEEDS = {
+    "open_positions": "open_positions",
+    "open_orders": "open_orders_snapshot",
+    "fills": "fills_snapshot",
+    "balances": "balances_snapshot",
+}
+
+
+def sign_challenge(api_secret: str, challenge: str) -> str:
+    """Same HMAC-SHA512 over SHA-256 scheme as ``KrakenFuturesApi._sign_request``."""
+    digest = hashlib.sha256(challenge.encode()).digest()
+    sig = hmac.new(base64.b64decode(api_secret), digest, hashlib.sha512).digest()
+    return base64.b64encode(sig).decode()
+
+
+# ----------------------------------------------------------------------
+# WebSocket records -> the REST field names everything downstream reads
+# ----------------------------------------------------------------------
+ORDER_TYPES = {"limit": "lmt", "stop": "stp", "take_profit": "take_profit"}
+
+# WebSocket balance section -> (REST account name, account type)
+BALANCE_ACCOUNTS = {
+    "flex_futures": ("flex", "multiCollateralMarginAccount"),
+    "holding": ("cash", "cashAccount"),
+}
+
+
+def _camel(name: str) -> str:
+    head, *rest = name.split("_")
+    return head + "".join(part[:1].upper() + part[1:] for part in rest)
+
+
+def _camel_keys(record: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        _camel(k): _camel_keys(v) if isinstance(v, dict) and k != "currencies" else v
+        for k, v in record.items()
+    }
+
+
+def _rest_time(value: Any) -> Any:
+    """Milliseconds since the epoch -> REST's ``2026-10-16T12:00:00.000Z``."""
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return value
+    stamp = datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+    return stamp.strftime("%Y-%m-%dT%H:%M:%S.") + f"{stamp.microsecond // 1000:03d}Z"
+
+
+def _defined(record: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in record.items() if v is not None}
+
+
+def rest_position(position: Dict[str, Any]) -> Dict[str, Any]:
+    balance = position.get("balance") or 0
+    return _defined({
+        "symbol": position.get("instrument"),
+        "side": "short" if balance < 0 else "long",
+        "size": abs(balance),
+        "price": position.get("entry_price"),
+        "markPrice": position.get("mark_price"),
+        "pnl": position.get("pnl"),
+        "unrealizedFunding": position.get("unrealized_funding"),
+        "effectiveLeverage": position.get("effective_leverage"),
+        "liquidationThreshold": position.get("liquidation_threshold"),
+    })
+
+
+def rest_order(order: Dict[str, Any]) -> Dict[str, Any]:
+    return _defined({
+        "order_id": order.get("order_id"),
+        "cliOrdId": order.get("cli_ord_id"),
+        "symbol": order.get("instrument"),
+        "side": "sell" if order.get("direction") == 1 else "buy",
+        "orderType": ORDER_TYPES.get(order.get("type", ""), order.get("type")),
+        "limitPrice": order.get("limit_price"),
+        "stopPrice": order.get("stop_price"),
+        "unfilledSize": order.get("qty"),
+        "filledSize": order.get("filled"),
+        "reduceOnly": order.get("reduce_only"),
+        "receivedTime": _rest_time(order.get("time")),
+        "lastUpdateTime": _rest_time(order.get("last_update_time")),
+    })
+
+
+def rest_fill(fill: Dict[str, Any]) -> Dict[str, Any]:
+    return _defined({
+        "fill_id": fill.get("fill_id"),
+        "order_id": fill.get("order_id"),
+        "cliOrdId": fill.get("cli_ord_id"),
+        "symbol": fill.get("instrument"),
+        "side": "buy" if fill.get("buy", True) else "sell",
+        "size": fill.get("qty"),
+        "price": fill.get("price"),
+        "fillTime": _rest_time(fill.get("time")),
+        "fillType": fill.get("fill_type"),
+    })
+
+
+def rest_accounts(balances: Dict[str, Any]) -> Dict[str, Any]:
+    """``balances`` feed sections -> the ``accounts`` map of GET /accounts."""
+    accounts: Dict[str, Any] = {}
+    for section, value in balances.items():
+        if not isinstance(value, dict):
+            continue
+        if section in BALANCE_ACCOUNTS:
+            name, kind = BALANCE_ACCOUNTS[section]
+            if section == "holding":
+                accounts[name] = {"type": kind, "balances": dict(value)}
+            else:
+                accounts[name] = {"type": kind, **_camel_keys(value)}
+        elif section == "futures":
+            # one margin account per contract, e.g. {"fi_xbtusd": {...}}
+            for name, account in value.items():
+                if isinstance(account, dict):
+                    accounts[name] = {"type": "marginAccount", **_camel_keys(account)}
+    return accounts
+
+
+def rest_ticker(ticker: Dict[str, Any]) -> Dict[str, Any]:
+    renamed = {"product_id": "symbol", "change": "change24h", "volume": "vol24h"}
+    record = {renamed.get(k) or _camel(k): v for k, v in ticker.items() if k != "feed"}
+    if "time" in record:
+        record["lastTime"] = _rest_time(record.pop("time"))
+    return record
+
+
+class AccountState:
+    """Positions, orders, fills, balances and tickers, updated message by message."""
+
+    def __init__(self, fills_maxlen: int = 500) -> None:
+        self._lock = threading.Lock()
+        self.fills_maxlen = fills_maxlen
+        self.positions: Dict[str, Dict[str, Any]] = {}
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        self.fills: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.balances: Dict[str, Any] = {}
+        self.tickers: Dict[str, Dict[str, Any]] = {}
+        self.seen: set = set()  # snapshot feeds received since the last (re)connect
+        self.updated_at: Optional[float] = None
+        self.messages = 0
+
+    def reset(self) -> None:
+        """Forget which snapshots arrived; the data stays until they are replaced."""
+        with self._lock:
+            self.seen.clear()
+
+    def ready(self, feeds: Iterable[str]) -> bool:
+        with self._lock:
+            return all(SNAPSHOT_FEEDS[feed] in self.seen for feed in feeds)
+
+    def apply(self, message: Dict[str, Any]) -> None:
+        feed = message.get("feed")
+        if not feed or "event" in message:
+            return
+        with self._lock:
+            self.messages += 1
+            self.updated_at = time.time()
+            if feed == "open_positions":
+                # always the full position list
+                self.positions = {p["instrument"]: p for p in message.get("positions", [])}
+            elif feed == "open_orders_snapshot":
+                self.orders = {o["order_id"]: o for o in message.get("orders", [])}
+            elif feed == "open_orders":
+                order = message.get("order")
+                order_id = order["order_id"] if order else message.get("order_id")
+                if message.get("is_cancel") or order is None:
+                    self.orders.pop(order_id, None)
+                else:
+                    self.orders[order_id] = order
+            elif feed in ("fills_snapshot", "fills"):
+                if feed == "fills_snapshot":
+                    self.fills.clear()
+                for fill in message.get("fills", []):
+                    self.fills[fill.get("fill_id") or str(len(self.fills))] = fill
+                while len(self.fills) > self.fills_maxlen:
+                    self.fills.popitem(last=False)
+            elif feed in ("balances_snapshot", "balances"):
+                if feed == "balances_snapshot":
+                    self.balances = {}
+                self.balances.update(
+                    {k: v for k, v in message.items() if k not in ("feed", "account", "seq")}
+                )
+            elif feed in ("ticker", "ticker_lite"):
+                self.tickers[message["product_id"]] = message
+            else:
+                return
+            self.seen.add(feed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Copy of the state shaped like the REST payloads ``fetch_kraken_data``
+        stores, records included: WebSocket field names are mapped to REST's.
+        """
+        with self._lock:
+            balances = dict(self.balances)
+            positions = list(self.positions.values())
+            orders = list(self.orders.values())
+            fills = list(reversed(self.fills.values()))  # newest first
+            tickers = list(self.tickers.values())
+            updated_at = self.updated_at
+        return {
+            "accounts": {"accounts": rest_accounts(balances)},
+            "open_positions": {"openPositions": [rest_position(p) for p in positions]},
+            "open_orders": {"openOrders": [rest_order(o) for o in orders]},
+            "fills": {"fills": [rest_fill(f) for f in fills]},
+            "tickers": {"tickers": [rest_ticker(t) for t in tickers]},
+            "updated_at": updated_at,
+        }
+
+
+class KrakenFuturesFeed:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        api_secret: Optional[str] = None,
+        url: str = WS_URL,
+        private_feeds: Iterable[str] = PRIVATE_FEEDS,
+        products: Iterable[str] = (),
+        public_feeds: Iterable[str] = ("ticker",),
+        handlers: Iterable[Callable[[Dict[str, Any]], None]] = (),
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 30.0,
+        fills_maxlen: int = 500,
+    ) -> None:
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.url = url
+        self.private_feeds: List[str] = list(private_feeds) if api_key and api_secret else []
+        self.products: List[str] = list(products)
+        self.public_feeds: List[str] = list(public_feeds)
+        self.handlers = list(handlers)  # e.g. OrderBookManager.handle for "book"
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.state = AccountState(fills_maxlen)
+        self.connected = threading.Event()
+        self.reconnects = 0
+        self.skipped_messages = 0
+        self.last_error: Optional[str] = None
+        self._stopping = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._ws: Optional[ClientConnection] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # public interface
+    # ------------------------------------------------------------------
+    def start(self) -> "KrakenFuturesFeed":
+        self._stopping = False
+        self._loop = asyncio.new_event_loop()
+        self._task = self._loop.create_task(self._run())
+        self._thread = threading.Thread(target=self._thread_main, name="kraken-ws", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopping = True
+        if self._loop is None or self._task is None or self._task.done():
+            return
+        ws = self._ws
+        if ws is not None:
+            # a clean close handshake; cancelling mid-read would send 1011
+            try:
+                asyncio.run_coroutine_threadsafe(ws.close(), self._loop).result(timeout=2)
+            except Exception:
+                pass
+        try:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        except RuntimeError:
+            pass  # the loop already finished and closed itself
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "KrakenFuturesFeed":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until every private feed has delivered its initial snapshot."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.ready:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    @property
+    def ready(self) -> bool:
+        return self.connected.is_set() and self.state.ready(self.private_feeds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return self.state.snapshot()
+
+    def subscribe_products(self, product_ids: Iterable[str]) -> None:
+        new = [p for p in product_ids if p not in self.products]
+        self.products.extend(new)
+        if new and self._loop is not None and self._ws is not None:
+            for feed in self.public_feeds:
+                message = {"event": "subscribe", "feed": feed, "product_ids": new}
+                asyncio.run_coroutine_threadsafe(self._ws.send(json.dumps(message)), self._loop)
+
+    # ------------------------------------------------------------------
+    # connection loop
+    # ------------------------------------------------------------------
+    def _thread_main(self) -> None:
+        assert self._loop is not None and self._task is not None
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    async def _run(self) -> None:
+        delay = self.reconnect_delay
+        while not self._stopping:
+            try:
+                async with connect(self.url, ping_interval=30) as ws:
+                    self._ws = ws
+                    await self._subscribe(ws)
+                    self.connected.set()
+                    delay = self.reconnect_delay
+                    async for raw in ws:
+                        try:
+                            self._handle(kraken_json.loads(raw))
+                        except Exception as e:
+                            # one bad message (or failing handler) must not end the feed
+                            self.skipped_messages += 1
+                            self.last_error = f"message skipped: {type(e).__name__}: {e}"
+                            log.exception("Kraken feed: skipped message %.200r", raw)
+            except (OSError, WebSocketException, asyncio.TimeoutError, ValueError) as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+            except Exception as e:  # anything else still goes through reconnect and backoff
+                self.last_error = f"{type(e).__name__}: {e}"
+                log.exception("Kraken feed: connection failed unexpectedly")
+            finally:
+                self._ws = None
+                self.connected.clear()
+                self.state.reset()
+            if self._stopping:
+                break
+            self.reconnects += 1
+            await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _subscribe(self, ws: ClientConnection) -> None:
+        for feed in self.public_feeds if self.products else ():
+            await ws.send(json.dumps(
+                {"event": "subscribe", "feed": feed, "product_ids": self.products}
+            ))
+        if not self.private_feeds:
+            return
+
+        await ws.send(json.dumps({"event": "challenge", "api_key": self.api_key}))
+        while True:
+            message = json.loads(await asyncio.wait_for(ws.recv(), timeout=10))
+            if message.get("event") == "challenge":
+                challenge = message["message"]
+                break
+            if message.get("event") == "error":
+                raise ValueError(f"challenge rejected: {message.get('message')}")
+            self._handle(message)
+
+        signed = sign_challenge(self.api_secret or "", challenge)
+        for feed in self.private_feeds:
+            await ws.send(json.dumps({
+                "event": "subscribe",
+                "feed": feed,
+                "api_key": self.api_key,
+                "original_challenge": challenge,
+                "signed_challenge": signed,
+            }))
+
+    def _handle(self, message: Dict[str, Any]) -> None:
+        if message.get("event") == "error":
+            self.last_error = message.get("message")
+        self.state.apply(message)
+        for handler in self.handlers:
+            handler(message)
@@ -0,0 +1,99 @@
+"""
+Content-addressed cache of generated pages.
+
+A page is keyed on a hash of the Kraken snapshot -- normalized so that
+volatile fields (timestamps) and float noise do not count as a change --
+together with the prompt template. When neither has changed, the page
+generated last time is reused instead of calling Gemini again.
+"""
+import hashlib
+import os
+import time
+from collections.abc import Mapping
+
+import kraken_json
+
+# Fields that change on every fetch without the account changing
+VOLATILE_KEYS = frozenset({'timestamp', 'serverTime', 'server_time', 'updated_at', 'data_points',
+                           'fetch_seconds'})
+
+
+def normalize(value, significant_digits=6):
+    """Drop volatile keys and round floats so equal-in-substance snapshots compare equal"""
+    if isinstance(value, Mapping):  # LazyJson sections too
+        return {k: normalize(v, significant_digits)
+                for k, v in value.items() if k not in VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [normalize(v, significant_digits) for v in value]
+    if isinstance(value, float):
+        return float(f"{value:.{significant_digits}g}")
+    return value
+
+
+class PageCache:
+    """Generated HTML on disk, one file per key, with TTL and LRU eviction"""
+
+    def __init__(self, directory='.page_cache', ttl=6 * 3600, max_entries=32, significant_digits=6):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.significant_digits = significant_digits
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, kraken_data, template):
+        normalized = normalize(kraken_data, self.significant_digits)
+        payload = kraken_json.dumps(normalized, sort_keys=True)
+        digest = hashlib.sha256()
+        digest.update(hashlib.sha256(template.encode('utf-8')).digest())
+        digest.update(payload)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.html")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if self.ttl is not None and age > self.ttl:
+                os.remove(path)
+                self.evictions += 1
+                raise FileNotFoundError(path)
+            with open(path, 'r', encoding='utf-8') as f:
+                html = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        os.utime(path, (time.time(), os.path.getmtime(path)))  # atime = last use
+        self.hits += 1
+        return html
+
+    def put(self, key, html):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        entries = [os.path.join(self.directory, name)
+                   for name in os.listdir(self.directory) if name.endswith('.html')]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=os.path.getatime)  # least recently used first
+        for path in entries[:len(entries) - self.max_entries]:
+            os.remove(path)
+            self.evictions += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
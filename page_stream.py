@@ -0,0 +1,149 @@
+"""
+Streaming page generation.
+
+``HtmlStreamExtractor`` pulls the HTML document out of a model response
+while it is still arriving -- the same ```html / ``` / <html> rules as
+``extract_html_from_response``, applied incrementally -- so the first
+bytes of the page are available as soon as the first chunk is.
+
+``GenerationProgress`` fans those pieces out to browsers listening on
+``/events`` (server-sent events). A client that connects half way
+through first gets everything generated so far, then the live tail.
+"""
+import json
+import threading
+import time
+
+FENCE = '```'
+
+
+class HtmlStreamExtractor:
+    """Feed response text chunk by chunk, get back the newly extracted HTML"""
+
+    def __init__(self):
+        self._buffer = ''
+        self._start = None  # where the HTML starts in the buffer
+        self._terminator = None  # what ends it
+        self._emitted = 0  # buffer position already handed out
+        self.done = False
+
+    def _locate(self):
+        lower = self._buffer.lower()
+        fence = lower.find(FENCE)
+        tag = min((i for i in (lower.find('<!doctype'), lower.find('<html')) if i != -1),
+                  default=-1)
+        if fence != -1 and (tag == -1 or fence < tag):
+            newline = self._buffer.find('\n', fence)
+            if newline == -1:
+                return  # the fence line (```html) is not complete yet
+            self._start, self._terminator = newline + 1, FENCE
+        elif tag != -1:
+            self._start, self._terminator = tag, '</html>'
+        else:
+            return
+        self._emitted = self._start
+
+    def feed(self, text):
+        if self.done or not text:
+            return ''
+        self._buffer += text
+        if self._start is None:
+            self._locate()
+            if self._start is None:
+                return ''
+        search_from = max(self._start, self._emitted - len(self._terminator))
+        end = self._buffer.lower().find(self._terminator, search_from)
+        if end != -1:
+            self.done = True
+            if self._terminator != FENCE:
+                end += len(self._terminator)  # keep </html> itself
+        else:
+            # hold back what could be the first half of a split terminator
+            end = max(self._emitted, len(self._buffer) - len(self._terminator) + 1)
+        piece = self._buffer[self._emitted:end]
+        self._emitted = end
+        return piece
+
+    def result(self):
+        """The whole extracted document (the raw response if no markers were found)"""
+        if self._start is None:
+            return self._buffer.strip()
+        if not self.done:
+            self._emitted = len(self._buffer)  # stream ended without a terminator
+        return self._buffer[self._start:self._emitted].strip()
+
+
+class GenerationProgress:
+    """Events of the current generation, for any number of SSE listeners"""
+
+    def __init__(self, keepalive=15):
+        self.keepalive = keepalive
+        self._condition = threading.Condition()
+        self._events = []
+        self._generation = 0
+        self.active = False
+
+    def begin(self):
+        with self._condition:
+            self._generation += 1
+            self._events = [('start', {'generation': self._generation, 'time': time.time()})]
+            self.active = True
+            self._condition.notify_all()
+
+    def chunk(self, html):
+        if html:
+            self._append('chunk', {'html': html})
+
+    def finish(self, ok, **details):
+        with self._condition:
+            self._events.append(('done', dict(details, ok=ok)))
+            self.active = False
+            self._condition.notify_all()
+
+    def _append(self, event, data):
+        with self._condition:
+            self._events.append((event, data))
+            self._condition.notify_all()
+
+    def listen(self):
+        """
+        Yield SSE-formatted byte strings until the current (or next)
+        generation finishes, with a comment line whenever it goes quiet.
+        """
+        with self._condition:
+            generation, position = self._generation, 0
+            if not self.active:
+                generation += 1  # nothing running: wait for the next one
+        while True:
+            with self._condition:
+                waited = self._condition.wait_for(
+                    lambda: self._generation > generation or (
+                        self._generation == generation and len(self._events) > position),
+                    timeout=self.keepalive,
+                )
+                if self._generation > generation:
+                    return  # a newer generation started, the client reconnects into it
+                events = self._events[position:] if waited else []
+                position += len(events)
+            if not events:
+                yield b': keepalive\n\n'
+                continue
+            for event, data in events:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
+                if event == 'done':
+                    return
+
+
+def stream_html(chunks, extractor=None, progress=None):
+    """Run a streamed response through the extractor, reporting progress; return the page"""
+    extractor = extractor or HtmlStreamExtractor()
+    first_chunk_at = None
+    started = time.perf_counter()
+    for text in chunks:
+        piece = extractor.feed(text)
+        if piece and first_chunk_at is None:
+            first_chunk_at = time.perf_counter() - started
+            print(f"⚡ First HTML after {first_chunk_at:.2f}s")
+        if progress is not None:
+            progress.chunk(piece)
+    return extractor.result()
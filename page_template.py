@@ -0,0 +1,127 @@
+"""
+Data-free page templates and a fast local renderer.
+
+In template mode Gemini writes the page once, with placeholders where the
+numbers go; the template is cached and only rotated now and then. Every
+data refresh is then a local render taking milliseconds instead of an LLM
+call. Placeholders:
+
+    {{ accounts.flex.portfolioValue }}      a value from the summary (HTML-escaped)
+    {{#each positions.largest}} ... {{/each}}
+                                            repeat for every item; inside,
+                                            {{ symbol }} looks in the item first
+    {{ kraken_json }}                       the whole summary as JSON, for a
+                                            <script type="application/json">
+
+Templates are compiled once into literal text and lookups, so rendering is
+a walk over a short list.
+"""
+import html
+import json
+import re
+
+TAG = re.compile(r'\{\{\s*(#each\s+[\w.]+|/each|[\w.@]+)\s*\}\}')
+MISSING = '—'
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class Raw(str):
+    """Inserted as is, without HTML escaping"""
+
+
+def _format(value):
+    if value is None:
+        return MISSING
+    if isinstance(value, Raw):
+        return value
+    if isinstance(value, bool):
+        return 'yes' if value else 'no'
+    if isinstance(value, int):
+        return f"{value:,}"
+    if isinstance(value, float):
+        return f"{value:,.2f}" if abs(value) >= 1 else f"{value:.6g}"
+    if isinstance(value, (dict, list)):
+        return html.escape(json.dumps(value, separators=(',', ':')))
+    return html.escape(str(value))
+
+
+def _lookup(path, scopes):
+    for scope in reversed(scopes):
+        value = scope
+        for part in path:
+            if isinstance(value, dict) and part in value:
+                value = value[part]
+            elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+                value = value[int(part)]
+            else:
+                break
+        else:
+            return value
+    return None
+
+
+def compile_template(text):
+    """Parse ``text`` into nodes: strings, ('var', path) and ('each', path, nodes)"""
+    root = []
+    stack = [(None, root)]
+    position = 0
+    for match in TAG.finditer(text):
+        if match.start() > position:
+            stack[-1][1].append(text[position:match.start()])
+        tag = match.group(1)
+        if tag.startswith('#each'):
+            path = tuple(tag.split(None, 1)[1].split('.'))
+            body = []
+            stack[-1][1].append(('each', path, body))
+            stack.append((path, body))
+        elif tag == '/each':
+            if len(stack) == 1:
+                raise TemplateError(f"{{{{/each}}}} without {{{{#each}}}} at {match.start()}")
+            stack.pop()
+        else:
+            stack[-1][1].append(('var', tuple(tag.split('.'))))
+        position = match.end()
+    if len(stack) > 1:
+        raise TemplateError(f"unclosed {{{{#each {'.'.join(stack[-1][0])}}}}}")
+    if position < len(text):
+        root.append(text[position:])
+    return root
+
+
+def _render(nodes, scopes, out):
+    for node in nodes:
+        if isinstance(node, str):
+            out.append(node)
+        elif node[0] == 'var':
+            out.append(_format(_lookup(node[1], scopes)))
+        else:
+            items = _lookup(node[1], scopes)
+            if isinstance(items, dict):
+                items = [dict(value, key=key) if isinstance(value, dict) else value
+                         for key, value in items.items()]
+            for index, item in enumerate(items or ()):
+                scope = item if isinstance(item, dict) else {'this': item}
+                _render(node[2], scopes + [dict(scope, **{'@index': index})], out)
+
+
+class PageTemplate:
+    """A compiled template; ``render(context)`` fills it in"""
+
+    def __init__(self, text):
+        self.text = text
+        self.nodes = compile_template(text)
+        self.placeholders = text.count('{{')
+
+    def render(self, context):
+        out = []
+        _render(self.nodes, [context], out)
+        return ''.join(out)
+
+
+def template_context(summary, **extra):
+    """Rendering context: the summary itself plus ``kraken_json`` for scripts"""
+    embedded = json.dumps(summary, separators=(',', ':'), default=str).replace('</', '<\\/')
+    return dict(summary, kraken_json=Raw(embedded), **extra)
@@ -0,0 +1,256 @@
+"""
+Compact, budgeted Kraken payload for the Gemini prompt.
+
+Instead of the whole pretty-printed snapshot, the prompt gets a summary:
+only the fields a page shows, positions and fills aggregated per symbol,
+the few most recent fills and orders, tickers of the symbols we hold,
+floats rounded, serialized without whitespace. The result is kept under a
+byte budget (tokens are estimated at ~4 bytes each) by trimming the
+longest-tail lists first, always in the same order, so the same snapshot
+always produces the same prompt -- which keeps the page cache effective.
+"""
+import json
+import math
+from collections.abc import Mapping
+
+ACCOUNT_FIELDS = (
+    'type', 'currency', 'portfolioValue', 'balanceValue', 'collateralValue', 'availableMargin',
+    'initialMargin', 'maintenanceMargin', 'pnl', 'unrealizedFunding', 'totalUnrealized',
+)
+# 'account' is only set in multi-account snapshots (see kraken_accounts.py)
+POSITION_FIELDS = ('account', 'symbol', 'side', 'size', 'price', 'unrealizedFunding', 'pnl')
+ORDER_FIELDS = (
+    'account', 'symbol', 'side', 'orderType', 'limitPrice', 'stopPrice', 'unfilledSize',
+)
+FILL_FIELDS = ('account', 'symbol', 'side', 'size', 'price', 'fillTime')
+SUBACCOUNT_FIELDS = ('ok', 'errors', 'positions', 'open_orders', 'fills')
+TICKER_FIELDS = ('last', 'markPrice', 'change24h', 'fundingRate', 'openInterest')
+
+# Trimmed in this order until the payload fits: (section, list) -> minimum kept
+TRIM_ORDER = (
+    (('fills', 'recent'), 0),
+    (('orders', 'recent'), 0),
+    (('tickers', None), 0),
+    (('fills', 'by_symbol'), 3),
+    (('orders', 'by_symbol'), 3),
+    (('positions', 'largest'), 3),
+    (('fills', 'by_symbol'), 0),
+    (('orders', 'by_symbol'), 0),
+    (('positions', 'largest'), 0),
+)
+
+BYTES_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Rough token count for a JSON payload (~4 bytes per token)"""
+    return math.ceil(len(text.encode('utf-8')) / BYTES_PER_TOKEN)
+
+
+def _round(value, significant_digits):
+    if isinstance(value, float):
+        return float(f"{value:.{significant_digits}g}")
+    if isinstance(value, dict):
+        return {k: _round(v, significant_digits) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_round(v, significant_digits) for v in value]
+    return value
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _project(record, fields):
+    return {k: record[k] for k in fields if record.get(k) not in (None, '')}
+
+
+def _records(section, key):
+    # sections are dicts, or LazyJson (a Mapping) from a lazy client
+    if isinstance(section, Mapping):
+        return section.get(key) or []
+    return []
+
+
+def _accounts(accounts):
+    if not isinstance(accounts, Mapping):
+        return {}
+    if 'error' in accounts:
+        return {'error': accounts['error']}
+    raw = accounts.get('accounts') or {}
+    summary = {}
+    for name in sorted(raw):
+        account = raw[name]
+        if not isinstance(account, dict):
+            continue
+        projected = _project(account, ACCOUNT_FIELDS)
+        for nested in ('auxiliary', 'balances', 'currencies'):
+            values = account.get(nested)
+            if isinstance(values, dict):
+                kept = {k: v for k, v in sorted(values.items())
+                        if isinstance(v, (int, float)) and v}
+                if kept:
+                    projected[nested] = kept
+        if projected:
+            summary[name] = projected
+    return summary
+
+
+def _positions(open_positions):
+    positions = _records(open_positions, 'openPositions')
+    largest = sorted(
+        (_project(p, POSITION_FIELDS) for p in positions),
+        key=lambda p: (-abs(_number(p.get('size')) * _number(p.get('price'))), p.get('symbol', '')),
+    )
+    return {
+        'count': len(positions),
+        'long': sum(1 for p in positions if p.get('side') == 'long'),
+        'short': sum(1 for p in positions if p.get('side') == 'short'),
+        'largest': largest,
+    }
+
+
+def _orders(open_orders, recent):
+    orders = _records(open_orders, 'openOrders')
+    by_symbol = {}
+    for order in orders:
+        entry = by_symbol.setdefault(order.get('symbol', '?'), {'buy': 0, 'sell': 0})
+        entry['buy' if order.get('side') == 'buy' else 'sell'] += 1
+    newest = sorted(orders, key=lambda o: (o.get('receivedTime') or '', o.get('order_id') or ''),
+                    reverse=True)
+    return {
+        'count': len(orders),
+        'by_symbol': [dict(symbol=s, **by_symbol[s]) for s in
+                      sorted(by_symbol, key=lambda s: (-sum(by_symbol[s].values()), s))],
+        'recent': [_project(o, ORDER_FIELDS) for o in newest[:recent]],
+    }
+
+
+def _fills(fills, recent):
+    records = _records(fills, 'fills')
+    by_symbol = {}
+    for fill in records:
+        size, price = _number(fill.get('size')), _number(fill.get('price'))
+        entry = by_symbol.setdefault(fill.get('symbol', '?'), {
+            'fills': 0, 'bought': 0.0, 'sold': 0.0, 'notional': 0.0, 'last': '',
+        })
+        entry['fills'] += 1
+        entry['bought' if fill.get('side') == 'buy' else 'sold'] += size
+        entry['notional'] += size * price
+        entry['last'] = max(entry['last'], fill.get('fillTime') or '')
+    summary = []
+    for symbol in sorted(by_symbol, key=lambda s: (-by_symbol[s]['fills'], s)):
+        entry = by_symbol[symbol]
+        volume = entry['bought'] + entry['sold']
+        notional = entry.pop('notional')
+        entry['vwap'] = notional / volume if volume else None
+        summary.append(dict(symbol=symbol, **entry))
+    newest = sorted(records, key=lambda f: (f.get('fillTime') or '', f.get('fill_id') or ''),
+                    reverse=True)
+    return {
+        'count': len(records),
+        'by_symbol': summary,
+        'recent': [_project(f, FILL_FIELDS) for f in newest[:recent]],
+    }
+
+
+def _tickers(tickers, symbols):
+    wanted = {s.lower() for s in symbols}
+    summary = {}
+    for ticker in _records(tickers, 'tickers'):
+        symbol = ticker.get('symbol') or ticker.get('product_id') or ''
+        if symbol.lower() in wanted:
+            projected = _project(ticker, TICKER_FIELDS)
+            if projected:
+                summary[symbol] = projected
+    return dict(sorted(summary.items()))
+
+
+def summarize(kraken_data, recent=5):
+    """The fields the page uses, with positions, orders and fills aggregated"""
+    positions = _positions(kraken_data.get('open_positions'))
+    orders = _orders(kraken_data.get('open_orders'), recent)
+    fills = _fills(kraken_data.get('fills'), recent)
+    held = [p['symbol'] for p in positions['largest'] if 'symbol' in p]
+    held += [o['symbol'] for o in orders['by_symbol']]
+    summary = {
+        'time': kraken_data.get('timestamp') or kraken_data.get('updated_at'),
+        'accounts': _accounts(kraken_data.get('accounts')),
+        'positions': positions,
+        'orders': orders,
+        'fills': fills,
+        'tickers': _tickers(kraken_data.get('tickers'), held),
+    }
+    subaccounts = kraken_data.get('subaccounts')
+    if isinstance(subaccounts, dict) and subaccounts:
+        summary['subaccounts'] = {name: _project(subaccounts[name], SUBACCOUNT_FIELDS)
+                                  for name in sorted(subaccounts)}
+    for name, section in kraken_data.items():
+        if isinstance(section, Mapping) and 'error' in section and name != 'accounts':
+            summary.setdefault('errors', {})[name] = section['error']
+    return summary
+
+
+def _dumps(payload):
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def _container(payload, section, key):
+    container = payload.get(section)
+    if key is not None:
+        container = container.get(key) if isinstance(container, dict) else None
+    return container
+
+
+def _cut(container, items, length):
+    """Make ``container`` (list or dict) hold the first ``length`` of ``items``"""
+    container.clear()
+    if isinstance(container, dict):
+        container.update(items[:length])
+    else:
+        container.extend(items[:length])
+
+
+def build_payload(kraken_data, max_bytes=None, max_tokens=None, recent=5, significant_digits=6):
+    """
+    Compact JSON of ``summarize(kraken_data)`` that fits ``max_bytes`` (or
+    ``max_tokens``), trimming list tails in TRIM_ORDER. What was cut is listed
+    under "truncated" so the page can say so. Counts and accounts are never
+    cut, so a budget below their size is exceeded rather than broken.
+    """
+    payload = _round(summarize(kraken_data, recent), significant_digits)
+    limits = [limit for limit in (max_bytes, max_tokens and max_tokens * BYTES_PER_TOKEN) if limit]
+    budget = min(limits) if limits else None
+    text = _dumps(payload)
+    if budget is None:
+        return text
+
+    truncated = {}
+    for (section, key), keep in TRIM_ORDER:
+        if len(text.encode('utf-8')) <= budget:
+            break
+        container = _container(payload, section, key)
+        if not container or len(container) <= keep:
+            continue
+        items = list(container.items()) if isinstance(container, dict) else list(container)
+        label = section if key is None else f"{section}.{key}"
+        already = truncated.get(label, 0)  # a list can come up twice in TRIM_ORDER
+        # binary search for the longest prefix that fits; lists are already in priority order
+        low, high = keep, len(items) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            _cut(container, items, middle)
+            truncated[label] = already + len(items) - middle
+            payload['truncated'] = truncated
+            if len(_dumps(payload).encode('utf-8')) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        _cut(container, items, low)
+        truncated[label] = already + len(items) - low
+        payload['truncated'] = truncated
+        text = _dumps(payload)
+    return text
@@ -0,0 +1,189 @@
+"""
+Versioned, atomic publishing of the generated site artifacts.
+
+Every publish writes a complete set of files (index.html + kraken.json)
+into a new numbered directory under ``.versions/``, fsyncs it, and then
+flips a single ``CURRENT`` pointer file with an atomic rename. Readers go
+through ``current()``, so they always get one whole version -- never a
+half-written page, and never a page next to the JSON of another run.
+The live ``index.html`` / ``kraken.json`` in the site directory are
+replaced atomically as well, for anything that still reads them directly.
+
+The last ``keep`` versions stay on disk for instant rollback:
+
+    python publisher.py list
+    python publisher.py rollback [steps]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from metrics import histogram
+
+PUBLISH_SECONDS = histogram('site_publish_seconds', 'Time to write, fsync and switch a version.')
+
+VERSIONS_DIR = '.versions'
+POINTER = 'CURRENT'
+
+
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path, data):
+    """Write bytes to a temp file next to ``path``, fsync, then rename over it"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_dir(directory)
+
+
+class Version:
+    def __init__(self, number, files, published_at):
+        self.number = number
+        self.files = files  # name -> bytes
+        self.published_at = published_at
+
+
+class ArtifactPublisher:
+    def __init__(self, directory='.', keep=5):
+        self.directory = os.path.abspath(directory)
+        self.versions_dir = os.path.join(self.directory, VERSIONS_DIR)
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._current = None
+        self._pointer_stamp = None
+
+    # ------------------------------------------------------------------
+    # reading
+    # ------------------------------------------------------------------
+    def _version_path(self, number):
+        return os.path.join(self.versions_dir, f"{number:06d}")
+
+    def versions(self):
+        """Version numbers on disk, oldest first"""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        return sorted(int(name) for name in os.listdir(self.versions_dir) if name.isdigit())
+
+    def _load(self, number):
+        path = self._version_path(number)
+        files = {}
+        for name in os.listdir(path):
+            with open(os.path.join(path, name), 'rb') as f:
+                files[name] = f.read()
+        return Version(number, files, os.path.getmtime(path))
+
+    def _pointer_stat(self):
+        try:
+            stat = os.stat(os.path.join(self.versions_dir, POINTER))
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def current(self):
+        """The live version; follows CURRENT if another process moved it"""
+        stamp = self._pointer_stat()
+        if stamp is not None and stamp != self._pointer_stamp:
+            with self._lock:
+                return self._current_locked()
+        return self._current
+
+    def _current_locked(self):
+        # called with the lock held, so a publish in this process cannot interleave
+        stamp = self._pointer_stat()
+        if stamp is not None and stamp != self._pointer_stamp:
+            with open(os.path.join(self.versions_dir, POINTER), 'r', encoding='utf-8') as f:
+                number = int(f.read().strip())
+            if self._current is None or self._current.number != number:
+                self._current = self._load(number)
+            self._pointer_stamp = stamp
+        return self._current
+
+    # ------------------------------------------------------------------
+    # writing
+    # ------------------------------------------------------------------
+    def publish(self, files):
+        """
+        Publish ``files`` (name -> str or bytes) as a new version. Files not
+        given are carried over from the current version, so the set stays whole.
+        """
+        with self._lock, PUBLISH_SECONDS.time():
+            previous = self._current_locked()
+            merged = dict(previous.files) if previous else {}
+            for name, data in files.items():
+                merged[name] = data.encode('utf-8') if isinstance(data, str) else data
+
+            os.makedirs(self.versions_dir, exist_ok=True)
+            existing = self.versions()
+            number = existing[-1] + 1 if existing else 1
+            staging = tempfile.mkdtemp(dir=self.versions_dir, prefix='.tmp-')
+            for name, data in merged.items():
+                with open(os.path.join(staging, name), 'wb') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+            _fsync_dir(staging)
+            os.rename(staging, self._version_path(number))
+            _fsync_dir(self.versions_dir)
+
+            version = Version(number, merged, time.time())
+            self._switch(version)
+            self._prune()
+            return version
+
+    def rollback(self, steps=1):
+        """Make the version ``steps`` before the current one live again"""
+        with self._lock:
+            live = self._current_locked()
+            existing = self.versions()
+            current = live.number if live else existing[-1] if existing else 0
+            older = [n for n in existing if n < current]
+            if len(older) < steps:
+                raise RuntimeError(f"only {len(older)} older versions to roll back to")
+            version = self._load(older[-steps])
+            self._switch(version)
+            return version
+
+    def _switch(self, version):
+        # the pointer flip is the commit point; the live copies follow it
+        write_atomic(os.path.join(self.versions_dir, POINTER), f"{version.number}\n".encode())
+        for name, data in version.files.items():
+            write_atomic(os.path.join(self.directory, name), data)
+        self._current = version
+        self._pointer_stamp = None  # re-stat on the next current()
+
+    def _prune(self):
+        existing = self.versions()
+        for number in existing[:-self.keep] if self.keep else []:
+            if self._current is None or number != self._current.number:
+                shutil.rmtree(self._version_path(number), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    publisher = ArtifactPublisher(os.path.dirname(os.path.abspath(__file__)))
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+    if command == 'rollback':
+        version = publisher.rollback(int(sys.argv[2]) if len(sys.argv) > 2 else 1)
+        print(f"⏪ Rolled back to version {version.number}")
+    else:
+        live = publisher.current()
+        for number in publisher.versions():
+            marker = '👉' if live and live.number == number else '  '
+            print(f"{marker} {number:06d}")
@@ -0,0 +1,267 @@
+"""
+Event-driven refresh: cheap data polls, expensive regenerations on change.
+
+Two cadences run side by side. The refresh loop fetches the Kraken
+snapshot every ``refresh_interval`` seconds (free with the WebSocket feed,
+four REST calls without it) and compares it with the snapshot the live
+page was generated from. When a ``ChangeDetector`` threshold trips -- a
+position opened, closed or resized, new fills, open orders changed, PnL
+or portfolio value moved -- it asks for a regeneration.
+
+Requests are debounced (a burst of fills becomes one page), rate limited
+by ``min_interval``, and handled by a single generator thread, so there is
+never more than one Gemini call in flight; requests that arrive meanwhile
+are coalesced into one follow-up. ``max_interval`` still refreshes a
+quiet page now and then, like the old hourly loop did. The first page is
+built from the refresh loop's first fetch; if that page had no data, the
+first snapshot that does arrive asks for a new one.
+
+A failed regeneration is retried after ``retry_delay`` seconds (never less
+than ``min_interval``), doubling with every failure in a row up to
+``max_interval``. Only successes may follow each other without a pause,
+so a generator that keeps failing never spins.
+"""
+import threading
+import time
+from collections.abc import Mapping
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _records(snapshot, section, key):
+    value = (snapshot or {}).get(section)
+    # sections are dicts, or LazyJson (a Mapping) from a lazy client
+    return (value.get(key) or []) if isinstance(value, Mapping) else []
+
+
+def _accounts(snapshot):
+    accounts = (snapshot or {}).get('accounts')
+    if not isinstance(accounts, Mapping):
+        return {}
+    raw = accounts.get('accounts') or {}
+    return {name: value for name, value in raw.items() if isinstance(value, dict)}
+
+
+class ChangeDetector:
+    """Says why a new snapshot is worth a new page, or nothing if it is not"""
+
+    def __init__(self, pnl_threshold=25.0, value_threshold=0.01, size_digits=6):
+        self.pnl_threshold = pnl_threshold  # absolute, in account currency
+        self.value_threshold = value_threshold  # relative portfolio value move
+        self.size_digits = size_digits
+
+    def positions(self, snapshot):
+        return {
+            (p.get('account'), p.get('symbol'), p.get('side')):
+                round(_number(p.get('size')), self.size_digits)
+            for p in _records(snapshot, 'open_positions', 'openPositions')
+        }
+
+    def fill_ids(self, snapshot):
+        return {f.get('fill_id') for f in _records(snapshot, 'fills', 'fills')}
+
+    def order_ids(self, snapshot):
+        return {o.get('order_id') for o in _records(snapshot, 'open_orders', 'openOrders')}
+
+    def pnl(self, snapshot):
+        return sum(_number(a.get('pnl')) for a in _accounts(snapshot).values())
+
+    def portfolio_value(self, snapshot):
+        return sum(_number(a.get('portfolioValue')) for a in _accounts(snapshot).values())
+
+    def changes(self, old, new):
+        if old is None:
+            return ['first snapshot']
+        reasons = []
+        before, after = self.positions(old), self.positions(new)
+        if before != after:
+            opened = len(after.keys() - before.keys())
+            closed = len(before.keys() - after.keys())
+            resized = sum(1 for k in after.keys() & before.keys() if after[k] != before[k])
+            reasons.append(f"positions (+{opened} -{closed} ~{resized})")
+        new_fills = len(self.fill_ids(new) - self.fill_ids(old))
+        if new_fills:
+            reasons.append(f"{new_fills} new fills")
+        if self.order_ids(new) != self.order_ids(old):
+            reasons.append("open orders")
+        pnl_delta = self.pnl(new) - self.pnl(old)
+        if abs(pnl_delta) >= self.pnl_threshold:
+            reasons.append(f"pnl {pnl_delta:+.2f}")
+        value_before = self.portfolio_value(old)
+        if value_before:
+            move = self.portfolio_value(new) / value_before - 1
+            if abs(move) >= self.value_threshold:
+                reasons.append(f"portfolio value {move:+.2%}")
+        return reasons
+
+
+class RefreshScheduler:
+    def __init__(self, fetch, regenerate, detector=None, refresh_interval=60, debounce=20,
+                 min_interval=300, max_interval=3600, retry_delay=30, clock=time.monotonic):
+        self.fetch = fetch  # () -> snapshot or None
+        self.regenerate = regenerate  # (snapshot, or None if no fetch succeeded yet) -> bool
+        self.detector = detector or ChangeDetector()
+        self.refresh_interval = refresh_interval
+        self.debounce = debounce
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.retry_delay = retry_delay
+        self.clock = clock
+        self._condition = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._latest = None  # newest fetched snapshot
+        self._generated = None  # snapshot the live page was built from
+        self._generating = None  # snapshot of the generation in flight
+        self._reasons = []  # pending request reasons, oldest first
+        self._first_request = None
+        self._last_request = None
+        self._last_attempt = None
+        self._last_success = None
+        self._retry_at = None  # set after a failure: no attempt before then
+        self._failures_in_row = 0
+        self.fetches = 0
+        self.requests = 0
+        self.generations = 0
+        self.failures = 0
+
+    # ------------------------------------------------------------------
+    # requests
+    # ------------------------------------------------------------------
+    def request(self, reason, immediate=False):
+        """Ask for a regeneration; overlapping requests collapse into one"""
+        with self._condition:
+            now = self.clock()
+            self.requests += 1
+            self._reasons.append(reason)
+            if self._first_request is None:
+                self._first_request = now
+            # immediate requests skip the debounce (the minimum interval still applies)
+            self._last_request = now - self.debounce if immediate else now
+            self._condition.notify_all()
+
+    def _due_in(self, now):
+        """Seconds until the generator may run; None while there is nothing to do"""
+        if self._reasons:
+            # debounce, but never let a stream of changes postpone the page forever
+            quiet = self._last_request + self.debounce
+            ready = min(quiet, self._first_request + max(self.debounce, self.min_interval))
+        elif self._last_success is not None and self.max_interval:
+            ready = self._last_success + self.max_interval
+        else:
+            return None
+        if self._last_attempt is not None:
+            ready = max(ready, self._last_attempt + self.min_interval)
+        if self._retry_at is not None:
+            ready = max(ready, self._retry_at)
+        return max(0.0, ready - now)
+
+    def _retry_delay(self):
+        delay = self.retry_delay * 2 ** (self._failures_in_row - 1)
+        if self.max_interval:
+            delay = min(delay, self.max_interval)
+        return max(delay, self.min_interval)
+
+    # ------------------------------------------------------------------
+    # loops
+    # ------------------------------------------------------------------
+    def _refresh_loop(self):
+        while not self._stopping.is_set():
+            snapshot = self.fetch()
+            with self._condition:
+                self.fetches += 1
+                previous = self._latest
+                if snapshot:
+                    self._latest = snapshot
+                # the page being generated counts as live: its data is not news again
+                baseline = self._generating if self._generating is not None else self._generated
+                pending = bool(self._reasons)
+                self._condition.notify_all()  # the generator waits for the first fetch
+            if snapshot:
+                # no baseline: the page was built without data, the first real snapshot is news
+                reasons = self.detector.changes(baseline, snapshot)
+                # while a request is pending, only news since the last poll counts again
+                if reasons and (not pending or (
+                        previous is not None and self.detector.changes(previous, snapshot))):
+                    self.request(', '.join(reasons))
+            self._stopping.wait(self.refresh_interval)
+
+    def _generate_loop(self):
+        while not self._stopping.is_set():
+            with self._condition:
+                while not self._stopping.is_set():
+                    # startup: generate from the refresh loop's first fetch, not one of our own
+                    wait = self._due_in(self.clock()) if self.fetches else None
+                    if wait == 0:
+                        break
+                    self._condition.wait(wait)
+                if self._stopping.is_set():
+                    return
+                reasons = self._reasons or ['max interval']
+                self._reasons, self._first_request, self._last_request = [], None, None
+                self._last_attempt = self.clock()
+                snapshot = self._generating = self._latest
+            print(f"🔁 Regenerating ({len(reasons)} request(s): {'; '.join(reasons[-3:])})")
+            try:
+                ok = self.regenerate(snapshot)
+            except Exception as e:
+                print(f"❌ Regeneration raised: {e}")
+                ok = False
+            with self._condition:
+                self._generating = None
+                if ok:
+                    self.generations += 1
+                    self._last_success = self.clock()
+                    self._retry_at, self._failures_in_row = None, 0
+                    if snapshot is not None:
+                        self._generated = snapshot
+                else:
+                    self.failures += 1
+                    self._failures_in_row += 1
+                    self._retry_at = self.clock() + self._retry_delay()
+                    self._reasons.append('retry')
+                    self._first_request = self._last_request = self.clock()
+
+    # ------------------------------------------------------------------
+    # lifecycle
+    # ------------------------------------------------------------------
+    def start(self, initial=True):
+        if initial:
+            self.request('startup', immediate=True)
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(target=self._refresh_loop, name='kraken-refresh', daemon=True),
+            threading.Thread(target=self._generate_loop, name='page-generate', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        with self._condition:
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def run_forever(self):
+        self.start()
+        try:
+            while not self._stopping.wait(3600):
+                pass
+        except KeyboardInterrupt:
+            self.stop()
+
+    def stats(self):
+        return {
+            'fetches': self.fetches,
+            'requests': self.requests,
+            'generations': self.generations,
+            'failures': self.failures,
+            'coalesced': max(0, self.requests - self.generations - self.failures),
+        }
@@ -1,76 +1,239 @@
 import os
-import http.server
-import socketserver
+import asyncio
 import google.generativeai as genai
-import json
-from datetime import datetime, timedelta
+from datetime import datetime
 import time
 import threading
+import logging
+import logging.handlers
+import queue
+import sys
 
 # Import the Kraken Futures library
-from kraken_futures import KrakenFuturesApi
+from kraken_accounts import SECTIONS, MultiAccountCollector, load_accounts
+from kraken_futures_async import AsyncKrakenFuturesApi
+import kraken_json
+from kraken_ws import KrakenFuturesFeed
+from metrics import histogram
+from page_cache import PageCache
+from page_stream import GenerationProgress, stream_html
+from page_template import PageTemplate, TemplateError, template_context
+from prompt_payload import build_payload, estimate_tokens, summarize
+from publisher import ArtifactPublisher
+from refresh_scheduler import ChangeDetector, RefreshScheduler
+from site_server import make_server
+
+# Pipeline timings, exposed with everything else on the server's /metrics
+GEMINI_SECONDS = histogram('gemini_request_seconds', 'Time per Gemini call.', ('mode',))
+EXTRACT_SECONDS = histogram('html_extract_seconds', 'Time to extract HTML from a response.')
+RENDER_SECONDS = histogram('template_render_seconds', 'Time to render data into the template.')
+
+# Prompts go through a queue to a background thread (LOG_PROMPT=1), never delaying generation
+prompt_log = logging.getLogger('primate.prompt')
+if os.getenv('LOG_PROMPT') == '1':
+    _prompt_queue = queue.SimpleQueue()
+    prompt_log.addHandler(logging.handlers.QueueHandler(_prompt_queue))
+    prompt_log.setLevel(logging.INFO)
+    prompt_log.propagate = False
+    logging.handlers.QueueListener(_prompt_queue, logging.StreamHandler(sys.stdout)).start()
+
+# Overridable so the pipeline can run against a local stand-in (see bench.py cycle)
+KRAKEN_FUTURES_URL = os.getenv('KRAKEN_FUTURES_URL', 'https://futures.kraken.com')
+
+# Upper bound on the Kraken summary pasted into the prompt (~4 bytes per token)
+PROMPT_MAX_TOKENS = int(os.getenv('PROMPT_MAX_TOKENS', 4000))
+
+# index.html + kraken.json are published together as one atomic version
+publisher = ArtifactPublisher(
+    os.path.dirname(os.path.abspath(__file__)),
+    keep=int(os.getenv('PUBLISH_KEEP_VERSIONS', 5)),
+)
+
+# Partial pages pushed to browsers on /events while Gemini streams (GEMINI_STREAM=1)
+generation_progress = GenerationProgress()
+
+# Live WebSocket account feed, started when KRAKEN_USE_WEBSOCKET=1
+account_feed = None
+
+# REST client for the single-account snapshot, created on first use and kept
+# so its pooled connections survive between refreshes
+kraken_client = None
+
+# Subaccounts fetched in parallel into one snapshot (KRAKEN_ACCOUNTS / KRAKEN_ACCOUNTS_FILE),
+# created on first use and kept so every account reuses its client
+account_collector = None
+
+# Generated pages keyed on the (normalized) Kraken snapshot and the prompt
+page_cache = PageCache(
+    directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), '.page_cache'),
+    ttl=float(os.getenv('PAGE_CACHE_TTL', 6 * 3600)),
+    max_entries=int(os.getenv('PAGE_CACHE_MAX_ENTRIES', 32)),
+)
+
+# PAGE_MODE=template: Gemini writes a page template now and then, every data
+# refresh is rendered into it locally in milliseconds
+PAGE_MODE = os.getenv('PAGE_MODE', 'generate')
+
+# Page templates, keyed on the template prompt and rotated after TEMPLATE_ROTATE_AFTER seconds
+template_cache = PageCache(
+    directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), '.page_cache', 'templates'),
+    ttl=float(os.getenv('TEMPLATE_ROTATE_AFTER', 24 * 3600)),
+    max_entries=4,
+)
+
+# Compiled template in use, kept when a rotation fails
+page_template = None
+
+# After a failed rotation Gemini is asked again only after TEMPLATE_RETRY_AFTER seconds
+TEMPLATE_RETRY_AFTER = float(os.getenv('TEMPLATE_RETRY_AFTER', 300))
+template_retry_at = None
+
+PROMPT_TEMPLATE = """
+    output HTML nothing else
+    create a website for a company called PRIMATE
+    
+    Design requirements:
+    - Color palette: LIGHT COLOURS ABOVE, DARK COLORS BELOW AND ACCENTUATED BLUE THE ONE USED EVERYWHERE
+    - Tone: PROFESSIONAL CHAOS
+    - Mobile friendly
+    
+    Product focus: Tripper, it does stuff
+    Data source: {kraken_payload}
+    
+    generate a website that is fun to explore with hidden dimensions and quirks
+    current time is your theme 
+    """
+
+# Filled with str.replace, not format(): the placeholders use braces themselves
+TEMPLATE_PROMPT = """
+    output HTML nothing else
+    create a website template for a company called PRIMATE
+    
+    Design requirements:
+    - Color palette: LIGHT COLOURS ABOVE, DARK COLORS BELOW AND ACCENTUATED BLUE THE ONE USED EVERYWHERE
+    - Tone: PROFESSIONAL CHAOS
+    - Mobile friendly
+    
+    Product focus: Tripper, it does stuff
+    
+    Do NOT write any numbers from the data into the page. Use placeholders,
+    they are filled in every few seconds with live data:
+    - {{ accounts.flex.portfolioValue }} inserts one value (dotted path into the data)
+    - {{#each positions.largest}} <li>{{ symbol }} {{ side }} {{ size }}</li> {{/each}}
+      repeats for every item of a list
+    - {{ generated_at }} is the time of the data
+    - <script type="application/json" id="kraken-data">{{ kraken_json }}</script> embeds
+      all of it as JSON for your scripts
+    
+    Data structure (example values): {kraken_payload}
+    
+    generate a website that is fun to explore with hidden dimensions and quirks
+    current time is your theme 
+    """
+
+async def _gather_snapshot(api_key, api_secret):
+    """Fetch the four snapshot endpoints concurrently, over the kept-alive client"""
+    global kraken_client
+    if kraken_client is None:
+        kraken_client = AsyncKrakenFuturesApi(api_key, api_secret, KRAKEN_FUTURES_URL)
+    return await kraken_client.gather_snapshot({'limit': 50})
+
+def _collect_accounts():
+    """One merged snapshot of every configured account, or None if none could be fetched"""
+    global account_collector
+    if account_collector is None:
+        account_collector = MultiAccountCollector(
+            load_accounts(), KRAKEN_FUTURES_URL,
+            max_workers=int(os.getenv('KRAKEN_ACCOUNT_WORKERS', 32)),
+            fills_params={'limit': 50},
+        )
+    kraken_data = account_collector.collect()
+    failed = {name: status['errors'] for name, status in kraken_data['subaccounts'].items()
+              if not status['ok']}
+    for name, errors in failed.items():
+        print(f"⚠️  Account {name}: {'; '.join(f'{k}: {v}' for k, v in errors.items())}")
+    # partial data still makes a page; nothing at all is treated like a failed fetch
+    if len(failed) == len(kraken_data['subaccounts']) and all(
+            'client' in errors or len(errors) == len(SECTIONS) for errors in failed.values()):
+        return None
+    return kraken_data
+
+def start_account_feed():
+    """Start the Kraken WebSocket feed so snapshots no longer need REST polling"""
+    global account_feed
+    api_key = os.getenv('KRAKEN_API_KEY')
+    api_secret = os.getenv('KRAKEN_SECRET_KEY')
+    if not api_key or not api_secret:
+        print("❌ Kraken API keys not found, WebSocket feed not started")
+        return None
+    
+    account_feed = KrakenFuturesFeed(api_key, api_secret).start()
+    if account_feed.wait_ready(timeout=15):
+        print("📡 WebSocket account feed connected")
+    else:
+        print(f"⚠️  WebSocket feed not ready yet ({account_feed.last_error}), using REST meanwhile")
+    return account_feed
 
 def fetch_kraken_data():
-    """Fetch all account data from Kraken Futures and save to kraken.json"""
+    """Fetch all account data from Kraken Futures (published with the page as kraken.json)"""
     try:
         # Get API keys from environment
         api_key = os.getenv('KRAKEN_API_KEY')
         api_secret = os.getenv('KRAKEN_SECRET_KEY')
-        
-        if not api_key or not api_secret:
+        multi_account = bool(os.getenv('KRAKEN_ACCOUNTS') or os.getenv('KRAKEN_ACCOUNTS_FILE'))
+
+        if not multi_account and (not api_key or not api_secret):
             print("❌ Kraken API keys not found in environment variables")
             return None
-        
-        print("🔗 Connecting to Kraken Futures API...")
-        api = KrakenFuturesApi(api_key, api_secret)
-        
-        # Fetch comprehensive account data
-        print("📊 Fetching account data...")
-        kraken_data = {}
-        
-        # Account information
-        kraken_data['accounts'] = api.get_accounts()
-        print("✅ Fetched account balances")
-        
-        # Open positions
-        kraken_data['open_positions'] = api.get_open_positions()
-        print("✅ Fetched open positions")
-        
-        # Open orders
-        kraken_data['open_orders'] = api.get_open_orders()
-        print("✅ Fetched open orders")
-        
-        # Recent fills/trades
-        kraken_data['fills'] = api.get_fills({'limit': 50})  # Last 50 fills
-        print("✅ Fetched recent fills")
+
+        if multi_account:
+            print("📊 Fetching data of every configured account in parallel...")
+            kraken_data = _collect_accounts()
+            if kraken_data is None:
+                print("❌ No account could be fetched")
+                return None
+            ok = sum(1 for status in kraken_data['subaccounts'].values() if status['ok'])
+            print(f"✅ Fetched {ok}/{len(kraken_data['subaccounts'])} accounts completely")
+        elif account_feed is not None and account_feed.ready:
+            # The feed keeps the account state current, no REST calls needed
+            kraken_data = account_feed.snapshot()
+            print("⚡ Read account snapshot from the WebSocket feed")
+        else:
+            print("🔗 Connecting to Kraken Futures API...")
+            # Fetch comprehensive account data: balances, open positions, open
+            # orders and the last 50 fills, requested concurrently
+            print("📊 Fetching account data...")
+            kraken_data = asyncio.run(_gather_snapshot(api_key, api_secret))
+            print("✅ Fetched account balances, open positions, open orders and recent fills")
         
         # Add timestamp
         kraken_data['timestamp'] = datetime.now().isoformat()
         kraken_data['data_points'] = len(kraken_data)
         
-        # Write to kraken.json
-        with open('kraken.json', 'w', encoding='utf-8') as f:
-            json.dump(kraken_data, f, indent=2)
-        
-        print(f"✅ Kraken data saved to kraken.json ({len(json.dumps(kraken_data))} bytes)")
+        print(f"✅ Kraken data fetched ({len(kraken_data)} sections)")
         return kraken_data
         
     except Exception as e:
         print(f"❌ Error fetching Kraken data: {e}")
         return None
 
-def get_gemini_response(api_key, prompt):
+def create_gemini_model(api_key):
+    """The Gemini model used for every generation"""
+    # Configure Gemini
+    genai.configure(api_key=api_key)
+    
+    # Create the model - using correct Gemini 2.5 Flash Lite
+    return genai.GenerativeModel('gemini-2.5-flash-lite')
+
+def get_gemini_response(api_key, prompt, mode='page'):
     """Send prompt to Gemini API and return the response"""
     try:
-        # Configure Gemini
-        genai.configure(api_key=api_key)
-        
-        # Create the model - using correct Gemini 2.5 Flash Lite
-        model = genai.GenerativeModel('gemini-2.5-flash-lite')
+        model = create_gemini_model(api_key)
         
         print("🚀 Sending request to Gemini API...")
         # Generate content
-        response = model.generate_content(prompt)
+        with GEMINI_SECONDS.time(mode=mode):
+            response = model.generate_content(prompt)
         print("✅ Successfully received response from Gemini API")
         return response.text
         
@@ -78,6 +241,24 @@ def get_gemini_response(api_key, prompt):
         print(f"❌ Error calling Gemini API: {e}")
         return None
 
+def get_gemini_response_stream(api_key, prompt, model=None):
+    """Stream the page from Gemini, extracting HTML and pushing progress as chunks arrive"""
+    try:
+        if model is None:
+            model = create_gemini_model(api_key)
+        
+        print("🚀 Streaming request to Gemini API...")
+        with GEMINI_SECONDS.time(mode='stream'):
+            response = model.generate_content(prompt, stream=True)
+            html_content = stream_html((chunk.text for chunk in response),
+                                       progress=generation_progress)
+        print(f"✅ Gemini stream finished, {len(html_content)} characters of HTML")
+        return html_content or None
+        
+    except Exception as e:
+        print(f"❌ Error streaming from Gemini API: {e}")
+        return None
+
 def extract_html_from_response(api_response):
     """Extract HTML content from Gemini API response - handles both code blocks and pure HTML"""
     if not api_response:
@@ -132,6 +313,81 @@ def extract_html_from_response(api_response):
     
     return html_content
 
+def generate_html(google_api_key, prompt):
+    """Get the page HTML from Gemini, streamed when GEMINI_STREAM=1"""
+    if os.getenv('GEMINI_STREAM') == '1':
+        # HTML is extracted on the fly and shown to /events listeners as it arrives
+        final_html = get_gemini_response_stream(google_api_key, prompt)
+        if not final_html:
+            print("❌ Failed to stream HTML from Gemini API")
+        return final_html
+    
+    # Get HTML from Gemini API
+    html_content = get_gemini_response(google_api_key, prompt)
+    
+    if not html_content:
+        print("❌ Failed to get response from Gemini API")
+        return None
+    
+    # Clean and extract HTML
+    with EXTRACT_SECONDS.time():
+        final_html = extract_html_from_response(html_content)
+    
+    if not final_html:
+        print("❌ Failed to extract HTML from API response")
+        return None
+    return final_html
+
+def get_page_template(google_api_key, kraken_data):
+    """Return the cached page template, asking Gemini for a new one when it is due"""
+    global page_template, template_retry_at
+    key = template_cache.key({}, TEMPLATE_PROMPT)
+    text = template_cache.get(key)
+    if text is not None:
+        if page_template is None or page_template.text != text:
+            page_template = PageTemplate(text)
+        return page_template
+    if template_retry_at is not None and time.monotonic() < template_retry_at:
+        return page_template
+    
+    print("🧩 Asking Gemini for a new page template...")
+    example = build_payload(kraken_data, max_tokens=PROMPT_MAX_TOKENS)
+    prompt = TEMPLATE_PROMPT.replace('{kraken_payload}', example)
+    html_content = get_gemini_response(google_api_key, prompt, mode='template')
+    with EXTRACT_SECONDS.time():
+        text = extract_html_from_response(html_content) if html_content else None
+    try:
+        template = PageTemplate(text) if text else None
+    except TemplateError as e:
+        print(f"❌ Template from Gemini does not parse: {e}")
+        template = None
+    if template is None or not template.placeholders:
+        template_retry_at = time.monotonic() + TEMPLATE_RETRY_AFTER
+        print(f"⚠️  No usable template from Gemini, keeping the previous one "
+              f"(next try in {TEMPLATE_RETRY_AFTER:.0f}s)")
+        return page_template
+    
+    template_cache.put(key, text)
+    page_template = template
+    template_retry_at = None
+    print(f"✅ New page template with {template.placeholders} placeholders")
+    return page_template
+
+def render_website(google_api_key, kraken_data, kraken_json_content):
+    """Render the live data into the cached template and publish it"""
+    template = get_page_template(google_api_key, kraken_data)
+    if template is None:
+        return False
+    
+    start = time.perf_counter()
+    context = template_context(summarize(kraken_data),
+                               generated_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    with RENDER_SECONDS.time():
+        html = template.render(context)
+    version = publisher.publish({'index.html': html, 'kraken.json': kraken_json_content})
+    print(f"⚡ Rendered version {version.number} in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return True
+
 def create_loading_page():
     """Create a temporary loading page while the real website is being generated"""
     loading_html = """
@@ -197,22 +453,47 @@ def create_loading_page():
             <div class="submessage">Fetching real-time data from Kraken Futures</div>
             <div class="submessage">This may take a few moments</div>
         </div>
+        <iframe id="preview" title="preview" style="display:none; position:fixed; inset:0;
+            width:100%; height:100%; border:0; background:white;"></iframe>
         <script>
             // Auto-reload every 10 seconds until proper page loads
-            setTimeout(() => {
-                window.location.reload();
-            }, 10000);
+            function reloadLater() {
+                setTimeout(() => {
+                    window.location.reload();
+                }, 10000);
+            }
+            if (window.EventSource) {
+                // Show the page while Gemini is still writing it
+                const events = new EventSource('/events');
+                const preview = document.getElementById('preview');
+                let html = '';
+                let pending = null;
+                events.addEventListener('start', () => { html = ''; });
+                events.addEventListener('chunk', (e) => {
+                    html += JSON.parse(e.data).html;
+                    if (!pending) {
+                        pending = setTimeout(() => {
+                            preview.srcdoc = html;
+                            preview.style.display = 'block';
+                            pending = null;
+                        }, 250);
+                    }
+                });
+                events.addEventListener('done', () => window.location.reload());
+                events.onerror = () => { events.close(); reloadLater(); };
+            } else {
+                reloadLater();
+            }
         </script>
     </body>
     </html>
     """
     
-    with open('index.html', 'w', encoding='utf-8') as f:
-        f.write(loading_html)
+    publisher.publish({'index.html': loading_html})
     print("⏳ Temporary loading page created")
 
-def generate_website():
-    """Generate the website with current Kraken data"""
+def generate_website(kraken_data=None):
+    """Generate the website with current Kraken data (fetched unless given)"""
     # Get Google API key from environment variable
     google_api_key = os.getenv('GOOGLE_API_KEY')
     if not google_api_key:
@@ -220,7 +501,8 @@ def generate_website():
         return False
     
     # Fetch Kraken data first
-    kraken_data = fetch_kraken_data()
+    if kraken_data is None:
+        kraken_data = fetch_kraken_data()
     if not kraken_data:
         print("❌ Failed to fetch Kraken data, using fallback data")
         # Create minimal fallback data
@@ -229,117 +511,101 @@ def generate_website():
             'open_positions': {'error': 'No position data'},
             'timestamp': datetime.now().isoformat()
         }
-        with open('kraken.json', 'w', encoding='utf-8') as f:
-            json.dump(kraken_data, f, indent=2)
-    
-    # Read the kraken.json file content for the prompt
-    with open('kraken.json', 'r', encoding='utf-8') as f:
-        kraken_json_content = f.read()
-    
-    # Create the prompt for Gemini with Kraken data
-    prompt = f"""
-    output HTML nothing else
-    create a website for a company called PRIMATE
     
-    Design requirements:
-    - Color palette: LIGHT COLOURS ABOVE, DARK COLORS BELOW AND ACCENTUATED BLUE THE ONE USED EVERYWHERE
-    - Tone: PROFESSIONAL CHAOS
-    - Mobile friendly
-    
-    Product focus: Tripper, it does stuff
-    Data source: {kraken_json_content}
-    
-    generate a website that is fun to explore with hidden dimensions and quirks
-    current time is your theme 
-    """
+    # Full kraken.json, published next to the page it produced: serialized once, compact
+    kraken_json_content = kraken_json.dumps(kraken_data)
+    
+    if PAGE_MODE == 'template':
+        generation_progress.begin()
+        ok = render_website(google_api_key, kraken_data, kraken_json_content)
+        generation_progress.finish(ok)
+        return ok
+    
+    # Create the prompt for Gemini with a compact summary of the Kraken data
+    kraken_payload = build_payload(kraken_data, max_tokens=PROMPT_MAX_TOKENS)
+    prompt = PROMPT_TEMPLATE.format(kraken_payload=kraken_payload)
+    print(f"🧮 Prompt payload: {len(kraken_payload.encode('utf-8'))} bytes "
+          f"(~{estimate_tokens(kraken_payload)} "
+          f"tokens) from a {len(kraken_json_content)} byte snapshot")
+    
+    # Reuse the last page if neither the data nor the prompt changed
+    cache_key = page_cache.key(kraken_data, PROMPT_TEMPLATE)
+    cached_html = page_cache.get(cache_key)
+    if cached_html is not None:
+        publisher.publish({'index.html': cached_html, 'kraken.json': kraken_json_content})
+        print(f"♻️  Kraken snapshot unchanged, reused cached page (cache: {page_cache.stats()})")
+        return True
     
     print("🌐 Generating website with real Kraken trading data...")
     
-    # Print the entire prompt with delays between lines
-    print("\n" + "="*80)
-    print("PROMPT SENT TO GEMINI:")
-    print("="*80)
-    
-    prompt_lines = prompt.split('\n')
-    for i, line in enumerate(prompt_lines):
-        print(line)
-        if i < len(prompt_lines) - 1:  # Don't sleep after the last line
-            time.sleep(0.1)
-    
-    print("="*80)
-    print("END OF PROMPT")
-    print("="*80 + "\n")
-    
-    # Get HTML from Gemini API
-    html_content = get_gemini_response(google_api_key, prompt)
-    
-    if not html_content:
-        print("❌ Failed to get response from Gemini API")
-        return False
-    
-    # Clean and extract HTML
-    final_html = extract_html_from_response(html_content)
+    # The whole prompt, printed off the generation path when LOG_PROMPT=1
+    prompt_log.info("%s\nPROMPT SENT TO GEMINI:\n%s\n%s\n%s\nEND OF PROMPT\n%s",
+                    "=" * 80, "=" * 80, prompt, "=" * 80, "=" * 80)
     
+    # /events listeners (the loading page) hear when the new page is live
+    generation_progress.begin()
+    final_html = generate_html(google_api_key, prompt)
     if not final_html:
-        print("❌ Failed to extract HTML from API response")
+        generation_progress.finish(False)
         return False
     
-    # Write HTML to file
-    with open('index.html', 'w', encoding='utf-8') as f:
-        f.write(final_html)
+    # Swap the page and its data in together
+    version = publisher.publish({'index.html': final_html, 'kraken.json': kraken_json_content})
+    page_cache.put(cache_key, final_html)
+    generation_progress.finish(True, version=version.number)
     
-    print("✅ Website generated successfully! Written to index.html")
+    print(f"✅ Website generated successfully! Published as version {version.number}")
+    print(f"🗃️  Page cache: {page_cache.stats()}")
     
-    # Verify files were written
-    if os.path.exists('index.html'):
-        file_size = os.path.getsize('index.html')
-        print(f"📁 File verification: index.html exists, size: {file_size} bytes")
-    
-    if os.path.exists('kraken.json'):
-        file_size = os.path.getsize('kraken.json')
-        print(f"📊 Data verification: kraken.json exists, size: {file_size} bytes")
+    # Verify what went live
+    for name, data in sorted(version.files.items()):
+        print(f"📁 File verification: {name} published, size: {len(data)} bytes")
     
     return True
 
-def calculate_next_hour():
-    """Calculate seconds until next full hour"""
-    now = datetime.now()
-    next_hour = (now + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
-    seconds_until_next_hour = (next_hour - now).total_seconds()
-    return seconds_until_next_hour
-
 def update_loop():
-    """Main update loop that runs every full hour"""
-    print("🔄 Starting hourly update loop...")
-    
-    while True:
-        # Generate website immediately on first run
-        success = generate_website()
-        if success:
-            print(f"✅ Website update completed at {datetime.now()}")
-        else:
-            print(f"❌ Website update failed at {datetime.now()}")
-        
-        # Calculate sleep time until next full hour
-        sleep_seconds = calculate_next_hour()
-        next_update = datetime.now() + timedelta(seconds=sleep_seconds)
-        print(f"⏰ Next update scheduled for: {next_update.strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"💤 Sleeping for {sleep_seconds:.0f} seconds...")
-        
-        # Sleep until next full hour
-        time.sleep(sleep_seconds)
+    """Refresh the data every minute, regenerate when the account changes"""
+    print("🔄 Starting event-driven update loop...")
+    if PAGE_MODE == 'template':
+        # rendering costs milliseconds: refresh every few seconds, re-render on any change
+        settings = dict(
+            detector=ChangeDetector(pnl_threshold=1e-9, value_threshold=1e-9),
+            refresh_interval=float(os.getenv('TEMPLATE_REFRESH_INTERVAL', 5)),
+            debounce=0,
+            min_interval=0,
+        )
+    else:
+        settings = dict(
+            detector=ChangeDetector(
+                pnl_threshold=float(os.getenv('REGENERATE_PNL_THRESHOLD', 25)),
+                value_threshold=float(os.getenv('REGENERATE_VALUE_THRESHOLD', 0.01)),
+            ),
+            refresh_interval=float(os.getenv('REFRESH_INTERVAL', 60)),
+            debounce=float(os.getenv('REGENERATE_DEBOUNCE', 20)),
+            min_interval=float(os.getenv('REGENERATE_MIN_INTERVAL', 300)),
+        )
+    scheduler = RefreshScheduler(
+        fetch_kraken_data,
+        # None means the scheduler's fetches failed: publish the fallback page, don't fetch again
+        lambda kraken_data: generate_website(kraken_data or {}),
+        max_interval=float(os.getenv('REGENERATE_MAX_INTERVAL', 3600)),
+        # failures back off from here even in template mode, where successes need no pause
+        retry_delay=float(os.getenv('REGENERATE_RETRY_DELAY', 30)),
+        **settings,
+    )
+    scheduler.run_forever()
+    print(f"📈 Scheduler stats: {scheduler.stats()}")
 
 def start_web_server(port=8080):
-    """Start a simple HTTP server to serve the website"""
+    """Start a threaded HTTP server to serve the website"""
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
     
-    # Create loading page if index.html doesn't exist
-    if not os.path.exists('index.html'):
+    # Create loading page if nothing has been published yet
+    if publisher.current() is None:
         create_loading_page()
         
-    handler = http.server.SimpleHTTPRequestHandler
-    
-    with socketserver.TCPServer(("", port), handler) as httpd:
+    with make_server(port, os.getcwd(), publisher=publisher,
+                     progress=generation_progress) as httpd:
         print(f"🌐 Web server running at http://localhost:{port}")
         print("📍 Serving from directory:", os.getcwd())
         print("📄 Available files:", [f for f in os.listdir('.') if f.endswith(('.html', '.json'))])
@@ -357,13 +623,10 @@ if __name__ == "__main__":
     server_thread = threading.Thread(target=start_web_server, daemon=True)
     server_thread.start()
     
-    # Generate the real website (will replace loading page)
-    print("🚀 Starting website generation...")
-    success = generate_website()
+    if os.getenv('KRAKEN_USE_WEBSOCKET') == '1':
+        start_account_feed()
     
-    if success:
-        print("🎉 Website successfully generated and ready!")
-        # Start the hourly update loop
-        update_loop()
-    else:
-        print("❌ Website generation failed, but loading page remains active")
+    # Generate the real website right away (it replaces the loading page),
+    # then again whenever the account changes
+    print("🚀 Starting website generation...")
+    update_loop()
@@ -0,0 +1,207 @@
+"""
+Concurrent HTTP server for the generated site.
+
+index.html and kraken.json are held in memory together with precomputed
+gzip (and brotli, when the ``brotli`` package is installed) variants, an
+ETag and a Last-Modified date. Both come from the publisher's current
+version, so a new pair goes live with one pointer swap and a client never
+gets this run's page next to the previous run's JSON. Every other hit is
+served straight from memory, and conditional requests are answered with
+304. ``/events`` streams generation progress as server-sent events when
+the server is given a ``GenerationProgress``, and ``/metrics`` exposes the
+process metrics in Prometheus text format. Anything else in the
+directory is served by the stock SimpleHTTPRequestHandler as before.
+"""
+import contextlib
+import email.utils
+import functools
+import gzip
+import hashlib
+import http.server
+import os
+import threading
+import time
+
+import metrics
+from publisher import ArtifactPublisher
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+CACHED_FILES = {
+    '/': 'index.html',
+    '/index.html': 'index.html',
+    '/kraken.json': 'kraken.json',
+}
+
+HTTP_SECONDS = metrics.histogram(
+    'site_http_request_seconds', 'Time to answer a site request.', ('path', 'status'),
+)
+
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.json': 'application/json',
+}
+
+
+class Asset:
+    """One file's bytes, compressed variants and validators"""
+
+    def __init__(self, name, data, mtime):
+        self.name = name
+        extension = os.path.splitext(name)[1]
+        self.content_type = CONTENT_TYPES.get(extension, 'application/octet-stream')
+        self.etag = hashlib.sha256(data).hexdigest()[:32]
+        self.last_modified = email.utils.formatdate(mtime, usegmt=True)
+        self.mtime = int(mtime)
+        self.variants = {'identity': data, 'gzip': gzip.compress(data, 6)}
+        if brotli is not None:
+            self.variants['br'] = brotli.compress(data, quality=9)
+
+
+class AssetStore:
+    """In-memory copies of the cached files, swapped whenever a new version is published"""
+
+    def __init__(self, publisher):
+        self.publisher = publisher
+        self._version = None
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        version = self.publisher.current()
+        if version is None or name not in version.files:
+            return None
+        with self._lock:
+            if version is not self._version:
+                # drop every asset of the old version at once: the pair stays consistent
+                self._version, self._assets = version, {}
+            asset = self._assets.get(name)
+            if asset is None:
+                asset = Asset(name, version.files[name], version.published_at)
+                self._assets[name] = asset
+        return asset
+
+
+def _pick_encoding(accept_encoding):
+    accepted = {part.split(';')[0].strip().lower() for part in accept_encoding.split(',')}
+    if 'br' in accepted and brotli is not None:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return 'identity'
+
+
+class SiteRequestHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True  # headers and body are separate writes
+    store = None  # set by make_server
+    progress = None  # set by make_server
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/events' and self.progress is not None:
+            return self._stream_events()  # long-lived, not timed
+        with self._timed(path):
+            if path == '/metrics':
+                return self._send_metrics()
+            self._serve(head_only=False)
+
+    def do_HEAD(self):
+        with self._timed(self.path.split('?', 1)[0]):
+            self._serve(head_only=True)
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    @contextlib.contextmanager
+    def _timed(self, path):
+        start = time.perf_counter()
+        self._status = 0
+        try:
+            yield
+        finally:
+            label = path if path in CACHED_FILES or path == '/metrics' else 'other'
+            HTTP_SECONDS.observe(time.perf_counter() - start, path=label, status=str(self._status))
+
+    def _send_metrics(self):
+        body = metrics.REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', metrics.CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _serve(self, head_only):
+        name = CACHED_FILES.get(self.path.split('?', 1)[0])
+        asset = self.store.get(name) if name else None
+        if asset is None:
+            return super().do_HEAD() if head_only else super().do_GET()
+
+        encoding = _pick_encoding(self.headers.get('Accept-Encoding', ''))
+        etag = f'"{asset.etag}-{encoding}"'
+        if self._not_modified(asset, etag):
+            self.send_response(304)
+            self._send_validators(asset, etag)
+            self.end_headers()
+            return
+
+        body = asset.variants[encoding]
+        self.send_response(200)
+        self.send_header('Content-Type', asset.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        self._send_validators(asset, etag)
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+    def _stream_events(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.close_connection = True  # no Content-Length: the stream ends with the connection
+        try:
+            for message in self.progress.listen():
+                self.wfile.write(message)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the browser went away
+
+    def _send_validators(self, asset, etag):
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', asset.last_modified)
+        self.send_header('Cache-Control', 'no-cache')  # always revalidate, it changes hourly
+        self.send_header('Vary', 'Accept-Encoding')
+
+    def _not_modified(self, asset, etag):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            return etag in tags or '*' in tags
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return asset.mtime <= since
+        return False
+
+
+def make_server(port=8080, directory='.', host='', publisher=None, progress=None):
+    """Threaded server: one slow client no longer blocks everybody else"""
+    store = AssetStore(publisher or ArtifactPublisher(directory))
+    handler_class = type('BoundSiteRequestHandler', (SiteRequestHandler,),
+                         {'store': store, 'progress': progress})
+    handler = functools.partial(handler_class, directory=directory)
+    httpd = http.server.ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    httpd.store = store
+    return httpd
@@ -0,0 +1,132 @@
+"""
+Page cache checks: python -m pytest test_page_cache.py
+
+generate_website() runs against a stubbed get_gemini_response, so the
+tests count Gemini calls without sending anything.
+"""
+import copy
+import os
+import time
+
+import pytest
+
+import kraken_json
+import run
+from kraken_json import LazyJson
+from page_cache import PageCache
+from publisher import ArtifactPublisher
+
+SNAPSHOT = {
+    'accounts': {'result': 'success', 'accounts': {
+        'flex': {'type': 'multiCollateralMarginAccount', 'portfolioValue': 10_250.5, 'pnl': 12.25},
+    }, 'serverTime': '2026-10-16T12:00:00.000Z'},
+    'open_positions': {'result': 'success', 'openPositions': [
+        {'symbol': 'PF_XBTUSD', 'side': 'long', 'size': 1.5, 'price': 61_000.0},
+        {'symbol': 'PF_ETHUSD', 'side': 'short', 'size': 4.0, 'price': 2_400.0},
+    ]},
+    'open_orders': {'result': 'success', 'openOrders': []},
+    'fills': {'result': 'success', 'fills': [
+        {'fill_id': 'f1', 'symbol': 'PF_XBTUSD', 'side': 'buy', 'size': 1.5, 'price': 61_000.0,
+         'fillTime': '2026-10-16T11:59:00.000Z'},
+    ]},
+    'timestamp': '2026-10-16T12:00:00',
+}
+
+
+@pytest.fixture
+def snapshot():
+    return copy.deepcopy(SNAPSHOT)
+
+
+@pytest.fixture
+def gemini_calls(tmp_path, monkeypatch):
+    """Prompts sent to the stubbed Gemini, with the page cache and publisher in tmp_path"""
+    calls = []
+
+    def gemini(api_key, prompt, mode='page'):
+        calls.append(prompt)
+        return f"```html\n<!DOCTYPE html><html><body>page {len(calls)}</body></html>\n```"
+
+    monkeypatch.setenv('GOOGLE_API_KEY', 'test')
+    monkeypatch.delenv('GEMINI_STREAM', raising=False)
+    monkeypatch.setattr(run, 'PAGE_MODE', 'generate')
+    monkeypatch.setattr(run, 'get_gemini_response', gemini)
+    monkeypatch.setattr(run, 'publisher', ArtifactPublisher(str(tmp_path / 'site')))
+    monkeypatch.setattr(run, 'page_cache', PageCache(str(tmp_path / 'cache')))
+    return calls
+
+
+def generate(kraken_data):
+    ok = run.generate_website(copy.deepcopy(kraken_data))
+    assert ok
+    return run.publisher.current().files['index.html'].decode()
+
+
+def test_unchanged_snapshot_makes_no_gemini_call(gemini_calls, snapshot):
+    first = generate(snapshot)
+    assert generate(snapshot) == first
+    assert len(gemini_calls) == 1
+    assert (run.page_cache.hits, run.page_cache.misses) == (1, 1)
+
+
+def test_new_fetch_time_alone_is_a_hit(gemini_calls, snapshot):
+    generate(snapshot)
+    snapshot['timestamp'] = '2026-10-16T12:01:00'
+    snapshot['accounts']['serverTime'] = '2026-10-16T12:01:00.000Z'
+    generate(snapshot)
+    assert len(gemini_calls) == 1
+
+
+def test_changed_position_misses(gemini_calls, snapshot):
+    first = generate(snapshot)
+    snapshot['open_positions']['openPositions'][0]['size'] = 2.5
+    assert generate(snapshot) != first
+    assert len(gemini_calls) == 2
+    assert run.page_cache.misses == 2
+
+
+def test_lazy_snapshot_has_the_same_key(tmp_path, snapshot):
+    # a lazy client's sections are LazyJson mappings, not dicts
+    lazy = {name: LazyJson(kraken_json.dumps(section)) if isinstance(section, dict) else section
+            for name, section in snapshot.items()}
+    lazy['accounts'] = LazyJson(kraken_json.dumps(
+        dict(snapshot['accounts'], serverTime='2026-10-16T12:05:00.000Z')))
+    cache = PageCache(str(tmp_path))
+    assert cache.key(lazy, run.PROMPT_TEMPLATE) == cache.key(snapshot, run.PROMPT_TEMPLATE)
+
+
+def _age(cache, key, seconds):
+    then = time.time() - seconds
+    os.utime(cache._path(key), (then, then))
+
+
+def test_ttl_expiry(tmp_path):
+    cache = PageCache(str(tmp_path), ttl=60)
+    cache.put('k', '<html></html>')
+    _age(cache, 'k', 30)
+    assert cache.get('k') == '<html></html>'
+    _age(cache, 'k', 61)
+    assert cache.get('k') is None
+    assert not os.path.exists(cache._path('k'))
+    assert cache.stats()['evictions'] == 1
+
+
+def test_ttl_expiry_regenerates(gemini_calls, snapshot):
+    generate(snapshot)
+    cache = run.page_cache
+    _age(cache, cache.key(snapshot, run.PROMPT_TEMPLATE), cache.ttl + 1)
+    generate(snapshot)
+    assert len(gemini_calls) == 2
+
+
+def test_eviction_at_max_entries(tmp_path):
+    cache = PageCache(str(tmp_path), max_entries=3)
+    for i, key in enumerate('abc'):
+        cache.put(key, key)
+        _age(cache, key, 100 - i)  # a oldest, c newest
+    cache.get('a')  # now the most recently used
+    cache.put('d', 'd')
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in 'acd'] == ['a', 'c', 'd']
+    assert cache.evictions == 1
+    assert len([name for name in os.listdir(tmp_path) if name.endswith('.html')]) == 3